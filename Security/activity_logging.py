@@ -11,32 +11,32 @@ WHY:
 - Provides traceability for security audits and incident response.
 
 HOW:
-- Writes structured request logs to logs/security.log.
+- Writes structured request logs to logs/security.log via a background
+  queue listener so disk I/O stays off the request path.
 """
 
 from __future__ import annotations
 
 import logging
-import os
-from logging.handlers import RotatingFileHandler
 
 from starlette.middleware.base import BaseHTTPMiddleware
+from Security.async_logging import attach_queued_file_handler
 from Security.secrets_redaction import redact
 from Security.metrics import increment_feature_event
 
 
+# Asset paths with no audit value bypass the middleware entirely. Everything
+# else, including the admin-only /metrics page, is logged.
+_SKIP_PREFIXES = ("/static/", "/favicon.ico")
+
+
 def _get_logger() -> logging.Logger:
     logger = logging.getLogger("security.activity")
     if logger.handlers:
         return logger
 
-    os.makedirs("logs", exist_ok=True)
-    handler = RotatingFileHandler("logs/security.log", maxBytes=2_000_000, backupCount=3)
-    formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
-    handler.setFormatter(formatter)
-
     logger.setLevel(logging.INFO)
-    logger.addHandler(handler)
+    attach_queued_file_handler(logger, "logs/security.log", max_bytes=2_000_000, backup_count=3)
     return logger
 
 
@@ -46,13 +46,18 @@ class ActivityLoggingMiddleware(BaseHTTPMiddleware):
         self.logger = _get_logger()
 
     async def dispatch(self, request, call_next):
+        if request.url.path.startswith(_SKIP_PREFIXES):
+            return await call_next(request)
         response = await call_next(request)
         increment_feature_event("activity-logging")
+        # Skip context lookups and redaction when INFO is filtered out.
+        if not self.logger.isEnabledFor(logging.INFO):
+            return response
         session = request.scope.get("session", {})
         user_id = session.get("user_id")
         request_id = getattr(request.state, "request_id", None)
         query = request.url.query
-        if query:
+        if query and "=" in query:
             query = redact(query)
         self.logger.info(
             "method=%s path=%s query=%s status=%s user_id=%s request_id=%s ip=%s",
@@ -67,13 +67,30 @@ def main() -> None:
     inspector = inspect(engine)
     col_type = _column_type()
 
+    # SQLite only accepts one ADD COLUMN per ALTER TABLE; other backends get
+    # a single DDL statement per table.
+    per_column = engine.dialect.name == "sqlite"
+
+    # One batched reflection query for all tables instead of one per table.
+    all_cols = inspector.get_multi_columns(filter_names=list(HASH_COLS))
+    existing_by_table = {table: {c["name"] for c in cols} for (_, table), cols in all_cols.items()}
+
     with engine.begin() as conn:
         for table, cols in HASH_COLS.items():
-            existing = {c["name"] for c in inspector.get_columns(table)}
-            for col in cols:
-                if col in existing:
-                    continue
-                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col} {col_type}"))
+            if table not in existing_by_table:
+                print(f"Skipped {table}: table not found")
+                continue
+            existing = existing_by_table[table]
+            missing = [col for col in cols if col not in existing]
+            if not missing:
+                continue
+            if per_column:
+                for col in missing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col} {col_type}"))
+            else:
+                clauses = ", ".join(f"ADD COLUMN {col} {col_type}" for col in missing)
+                conn.execute(text(f"ALTER TABLE {table} {clauses}"))
+            for col in missing:
                 print(f"Added {table}.{col}")
 
 
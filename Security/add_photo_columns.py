@@ -1,10 +1,26 @@
 """
 Database migration script to add photo_data and photo_mime_type columns to users table.
+backfill_photos() copies files referenced by photo_path into the photo_blob/photo_mime
+columns the app reads, in pages.
 """
 
+import mimetypes
+import os
+
 from sqlalchemy import text
 from app.database import engine
 
+# photo_path holds the URL the templates render (e.g. /static/uploads/users/x.jpg),
+# so files are looked up under the project's static directory.
+_STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+
+_SELECT_PAGE = text(
+    "SELECT id, photo_path FROM users "
+    "WHERE photo_blob IS NULL AND photo_path IS NOT NULL AND id > :last_id "
+    "ORDER BY id LIMIT :batch"
+)
+_UPDATE_PHOTO = text("UPDATE users SET photo_blob = :data, photo_mime = :mime WHERE id = :id")
+
 def add_photo_columns():
     """Add photo_data and photo_mime_type columns to users table if they don't exist"""
     with engine.connect() as conn:
@@ -68,5 +84,57 @@ def add_photo_columns():
             print(f"❌ Error during migration: {str(e)}")
             conn.rollback()
 
+def _resolve_photo_path(photo_path: str):
+    """Map a stored photo_path to a file under _STATIC_DIR, or None if it escapes it."""
+    rel = photo_path.replace("\\", "/").lstrip("/")
+    if rel.startswith("static/"):
+        rel = rel[len("static/"):]
+    static_dir = os.path.realpath(_STATIC_DIR)
+    path = os.path.realpath(os.path.join(static_dir, rel))
+    if os.path.commonpath([static_dir, path]) != static_dir:
+        return None
+    return path
+
+
+def _read_photo(photo_path: str):
+    path = _resolve_photo_path(photo_path)
+    if path is None or not os.path.isfile(path):
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    mime = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return data, mime
+
+
+def backfill_photos(batch: int = 1000) -> int:
+    """Copy photo_path files into photo_blob one page at a time; returns rows updated.
+
+    Pages are keyed on id (not OFFSET) so rows updated by earlier pages, or
+    skipped because the file is missing, never shift the window.
+    """
+    updated = 0
+    last_id = 0
+    with engine.connect() as conn:
+        while True:
+            rows = conn.execute(_SELECT_PAGE, {"last_id": last_id, "batch": batch}).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            params = []
+            for row in rows:
+                photo = _read_photo(row.photo_path)
+                if photo is None:
+                    continue
+                params.append({"data": photo[0], "mime": photo[1], "id": row.id})
+            # One short transaction per page keeps memory and lock time bounded.
+            if params:
+                conn.execute(_UPDATE_PHOTO, params)
+            conn.commit()
+            updated += len(params)
+            print(f"✅ Backfilled {updated} photos (up to id {last_id})")
+    return updated
+
+
 if __name__ == "__main__":
     add_photo_columns()
+    backfill_photos()
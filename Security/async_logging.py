@@ -0,0 +1,141 @@
+"""
+ASYNC LOG HANDLERS
+==================
+Queue-backed, buffered file logging for request-path loggers.
+"""
+
+# FLOW:
+# - attach_queued_file_handler() puts a QueueHandler on a logger.
+# - A background QueueListener writes records to a buffered rotating file.
+# WHY:
+# - Keeps disk writes out of request latency.
+# HOW:
+# - QueueHandler -> QueueListener -> BufferedRotatingFileHandler, flushed
+#   when the queue goes idle or every flush_interval seconds under load.
+# - LOG_BUFFER_BYTES / LOG_FLUSH_INTERVAL_MS tune how many lines each
+#   write() syscall carries.
+# - fsync_interval (seconds, 0 = never) adds a periodic fsync after flushes
+#   for logs that must survive a host crash, e.g. the audit trail.
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from Security.security_config import get_int
+
+
+_LISTENERS: list[QueueListener] = []
+
+# One write() syscall per LOG_BUFFER_BYTES of log lines; raise for bursty loads.
+LOG_BUFFER_BYTES = get_int("LOG_BUFFER_BYTES", 64 * 1024)
+LOG_FLUSH_INTERVAL_MS = get_int("LOG_FLUSH_INTERVAL_MS", 100)
+
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that buffers writes instead of flushing per record."""
+
+    def __init__(
+        self,
+        filename: str,
+        maxBytes: int = 0,
+        backupCount: int = 0,
+        bufferSize: int = LOG_BUFFER_BYTES,
+        flushInterval: float = LOG_FLUSH_INTERVAL_MS / 1000,
+        encoding: str = "utf-8",
+        fsyncInterval: float = 0,
+    ):
+        self.buffer_size = bufferSize
+        self.flush_interval = flushInterval
+        self.fsync_interval = fsyncInterval
+        self._size = 0
+        self._last_flush = time.monotonic()
+        self._last_fsync = self._last_flush
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding)
+
+    def _open(self):
+        stream = open(self.baseFilename, self.mode, buffering=self.buffer_size, encoding=self.encoding, errors=self.errors)
+        # Track size locally so rollover checks don't seek/stat per record.
+        self._size = stream.tell()
+        return stream
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            msg = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self._size + len(msg) >= self.maxBytes:
+                self.doRollover()
+            self.stream.write(msg)
+            self._size += len(msg)
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        super().flush()
+        now = time.monotonic()
+        self._last_flush = now
+        if self.fsync_interval and self.stream is not None and now - self._last_fsync >= self.fsync_interval:
+            self.acquire()
+            try:
+                os.fsync(self.stream.fileno())
+            finally:
+                self.release()
+            self._last_fsync = now
+
+
+class _FlushingQueueListener(QueueListener):
+    """QueueListener that flushes its handlers whenever the queue goes idle."""
+
+    def __init__(self, q, *handlers, flush_interval: float = 0.1):
+        super().__init__(q, *handlers, respect_handler_level=True)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, self.flush_interval)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush()
+
+
+def attach_queued_file_handler(
+    logger: logging.Logger,
+    path: str,
+    max_bytes: int = 2_000_000,
+    backup_count: int = 3,
+    fmt: str = "%(asctime)s %(levelname)s %(message)s",
+    fsync_interval: float = 0,
+) -> QueueListener:
+    """Route logger output through a queue to a buffered rotating file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    handler = BufferedRotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, fsyncInterval=fsync_interval
+    )
+    handler.setFormatter(logging.Formatter(fmt))
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    logger.addHandler(QueueHandler(log_queue))
+    listener = _FlushingQueueListener(log_queue, handler, flush_interval=handler.flush_interval)
+    listener.start()
+    _LISTENERS.append(listener)
+    return listener
+
+
+@atexit.register
+def _stop_listeners() -> None:
+    for listener in _LISTENERS:
+        try:
+            listener.stop()
+        except Exception:
+            pass
+    for listener in _LISTENERS:
+        for handler in listener.handlers:
+            handler.close()
@@ -10,39 +10,71 @@ Lightweight audit logging helper.
 # - Provides accountability for critical actions.
 # HOW:
 # - Emits structured log lines for review.
+# - The enable flag comes from the cached feature_enabled(); toggling it
+#   from the security console clears that cache.
 
 from __future__ import annotations
 
 import contextvars
+import functools
 import logging
-import os
-from logging.handlers import RotatingFileHandler
+import re
+from Security.async_logging import attach_queued_file_handler
 from Security.metrics import increment_feature_event
-from Security.security_config import feature_enabled
+from Security.security_config import feature_enabled, get_int
 
 
-logger = logging.getLogger("security.audit")
-if not logger.handlers:
-    os.makedirs("logs", exist_ok=True)
-    handler = RotatingFileHandler("logs/audit.log", maxBytes=2_000_000, backupCount=3)
-    formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
-    handler.setFormatter(formatter)
-    logger.setLevel(logging.INFO)
-    logger.addHandler(handler)
-
 _audit_ctx: contextvars.ContextVar[dict[str, str] | None] = contextvars.ContextVar("audit_ctx", default=None)
 
+# First comma-separated token of X-Forwarded-For, matched on raw header bytes.
+_FIRST_IP_RE = re.compile(rb"\s*([^,\s]+)")
+
+# Audit lines are batched by the queued handler; fsync at most this often.
+_AUDIT_FSYNC_INTERVAL_MS = get_int("AUDIT_FSYNC_INTERVAL_MS", 1000)
+
+_FULL_FMT = "event=%s user_id=%s ip=%s request_id=%s method=%s path=%s details=%s"
+_BARE_FMT = "event=%s user_id=%s details=%s"
+
+
+@functools.lru_cache(maxsize=1)
+def _logger() -> logging.Logger:
+    """Create logs/audit.log and its queue listener on first audit() call."""
+    logger = logging.getLogger("security.audit")
+    if not logger.handlers:
+        logger.setLevel(logging.INFO)
+        attach_queued_file_handler(
+            logger,
+            "logs/audit.log",
+            max_bytes=2_000_000,
+            backup_count=3,
+            fsync_interval=_AUDIT_FSYNC_INTERVAL_MS / 1000,
+        )
+    return logger
+
 
 def _client_ip(request) -> str:
-    xff = (request.headers.get("x-forwarded-for") or "").strip()
-    if xff:
-        return xff.split(",")[0].strip()
-    xrip = (request.headers.get("x-real-ip") or "").strip()
-    if xrip:
-        return xrip
-    if request.client and request.client.host:
-        return request.client.host
-    return "-"
+    cached = getattr(request.state, "_audit_client_ip", None)
+    if cached is not None:
+        return cached
+    forwarded = real_ip = None
+    for key, value in request.headers.raw:
+        if key == b"x-forwarded-for":
+            if forwarded is None:
+                forwarded = value
+        elif key == b"x-real-ip" and real_ip is None:
+            real_ip = value
+    ip = None
+    # Blank or leading-comma X-Forwarded-For doesn't match, so falls through.
+    if forwarded is not None:
+        match = _FIRST_IP_RE.match(forwarded)
+        if match:
+            ip = match.group(1).decode("latin-1")
+    if ip is None and real_ip is not None:
+        ip = real_ip.strip().decode("latin-1") or None
+    if ip is None:
+        ip = request.client.host if request.client and request.client.host else "-"
+    request.state._audit_client_ip = ip
+    return ip
 
 
 def set_audit_request_context(request):
@@ -63,15 +95,19 @@ def clear_audit_request_context(token) -> None:
 def audit(event: str, user_id: int | None = None, details: str | None = None) -> None:
     if not feature_enabled("audit-trail", True):
         return
-    ctx = _audit_ctx.get() or {}
-    logger.info(
-        "event=%s user_id=%s ip=%s request_id=%s method=%s path=%s details=%s",
-        event,
-        user_id,
-        ctx.get("ip", "-"),
-        ctx.get("request_id", ""),
-        ctx.get("method", ""),
-        ctx.get("path", ""),
-        details or "",
-    )
+    ctx = _audit_ctx.get()
+    if ctx is None:
+        # CLI/background callers have no request context to expand.
+        _logger().info(_BARE_FMT, event, user_id, details or "")
+    else:
+        _logger().info(
+            _FULL_FMT,
+            event,
+            user_id,
+            ctx.get("ip", "-"),
+            ctx.get("request_id", ""),
+            ctx.get("method", ""),
+            ctx.get("path", ""),
+            details or "",
+        )
     increment_feature_event("audit-trail")
@@ -15,16 +15,48 @@ HOW:
 - Uses Argon2 hashes to verify passwords without storing raw secrets.
 """
 
-from passlib.context import CryptContext
-from passlib.exc import UnknownHashError
+import hashlib
+
+import bcrypt
+from argon2 import PasswordHasher
+from argon2 import exceptions as argon2_exceptions
+from sqlalchemy import and_, bindparam, or_, select
 from sqlalchemy.orm import Session, load_only
 from app.models import User
-from Security.data_integrity import sha256_hex
+from Security.security_config import get_int
+
+
+# argon2-cffi binds the reference C implementation directly (no pure-Python
+# fallback). See README "Argon2 native build" for compiling it with SIMD.
+# ARGON2_LANES sets parallelism; it is part of the stored hash, so keep it the
+# same on every host or logins will keep rehashing via needs_rehash().
+ARGON2_LANES = max(1, get_int("ARGON2_LANES", 4))
+_PH = PasswordHasher(time_cost=3, memory_cost=65536, parallelism=ARGON2_LANES)
+_argon2_verify = _PH.verify
+_BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
 
 
-pwd_context = CryptContext(
-    schemes=["argon2", "bcrypt"],
-    deprecated="auto",
+# Built once so SQLAlchemy's compiled cache is hit on every login.
+# Rows created before employee_id_hash existed still match on the plain id.
+_AUTH_STMT = (
+    select(User)
+    .options(
+        load_only(
+            User.id,
+            User.employee_id,
+            User.password_hash,
+            User.role,
+            User.is_active,
+            User.employee_id_hash,
+        )
+    )
+    .where(
+        or_(
+            User.employee_id_hash == bindparam("h"),
+            and_(User.employee_id_hash.is_(None), User.employee_id == bindparam("username")),
+        )
+    )
+    .limit(1)
 )
 
 
@@ -32,29 +64,62 @@ def hash_password(password: str) -> str:
     """
     Hash a plain text password using Argon2.
     """
-    return pwd_context.hash(password)
+    return _PH.hash(password)
+
+
+def _bcrypt_verify(hashed_password: str, plain_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+    except ValueError:
+        return False
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a plain text password against a stored hash.
     """
-    try:
-        return pwd_context.verify(plain_password, hashed_password)
-    except UnknownHashError:
+    if not hashed_password:
         return False
+    # Argon2 is the common case, so test it first; "$2" covers legacy bcrypt
+    # hashes created before the Argon2 switch.
+    if hashed_password.startswith("$argon2"):
+        try:
+            return _argon2_verify(hashed_password, plain_password)
+        except (argon2_exceptions.VerificationError, argon2_exceptions.InvalidHash):
+            return False
+    if hashed_password.startswith("$2"):
+        return _bcrypt_verify(hashed_password, plain_password)
+    return False
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Return True if a verified hash is legacy bcrypt or uses outdated Argon2 parameters."""
+    if hashed_password.startswith(_BCRYPT_PREFIXES):
+        return True
+    try:
+        return _PH.check_needs_rehash(hashed_password)
+    except argon2_exceptions.InvalidHash:
+        return True
+
+
+def _upgrade_password_hash(db: Session, user: User, password: str) -> None:
+    """Re-hash with current parameters after a successful login; failures are non-fatal."""
+    try:
+        user.password_hash = hash_password(password)
+        db.commit()
+    except Exception:
+        db.rollback()
 
 
 def authenticate_user(db: Session, username: str, password: str):
     """Authenticate user by verifying username and password hash."""
     username = (username or "").strip()
-    username_hash = sha256_hex(username) if username else None
-    user = (
-        db.query(User)
-        .options(load_only(User.id, User.employee_id, User.password_hash, User.role, User.employee_id_hash))
-        .filter(User.employee_id_hash == username_hash)
-        .first()
-    )
+    if not username:
+        return None
+    username_hash = hashlib.sha256(username.encode("utf-8")).hexdigest()
+    user = db.execute(_AUTH_STMT, {"h": username_hash, "username": username}).scalars().first()
     if user and verify_password(password, user.password_hash):
+        if needs_rehash(user.password_hash):
+            _upgrade_password_hash(db, user, password)
         return user
     return None
@@ -1,6 +1,12 @@
 from __future__ import annotations
 
-from app.database import SessionLocal
+import functools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import and_, bindparam, column, inspect, or_, select, table, update
+
+from app.database import SessionLocal, engine
 from app.models import (
     User,
     Attendance,
@@ -12,273 +18,252 @@ from app.models import (
     LeaveRequest,
     Team,
 )
-from Security.data_integrity import sha256_hex
-from Security.hash_history import log_hash_history
-
-
-def _hash(value: str | None) -> str | None:
-    if value is None:
-        return None
-    return sha256_hex(value)
-
-
-def _set_hash(obj, hash_attr: str, source_attr: str) -> bool:
-    source_value = getattr(obj, source_attr)
-    new_value = _hash(source_value) if source_value else None
-    if getattr(obj, hash_attr) != new_value:
-        setattr(obj, hash_attr, new_value)
-        return True
-    return False
-
-
-def _maybe_log_history(
-    *,
-    entity_type: str,
-    entity_id: str | None,
-    field_name: str,
-    old_hash: str | None,
-    new_hash: str | None,
-    employee_name: str | None,
-    details: str,
-) -> None:
-    if old_hash == new_hash:
+from Security.hash_history import history_timestamp, log_hash_history_batch
+from Security.security_config import get_bool, get_int
+
+
+_PAGE_SIZE = 1000
+_HASH_MEMO_SIZE = 8192
+
+
+def _sha256_text(value) -> str:
+    return hashlib.sha256(str(value).encode("utf-8")).hexdigest()
+
+
+def _backfill_table(
+    db,
+    model,
+    fields: tuple[str, ...],
+    with_employee_name: bool = False,
+    only_missing: bool = False,
+    hash_value=_sha256_text,
+):
+    """Recompute ``<field>_hash`` for ``model`` one id-ordered page at a time.
+
+    The hash columns are added by add_hash_columns and are not mapped on
+    most models, so statements go through a lightweight Core ``table()``
+    naming just the id, source and hash columns (no ORM instances).
+    ``with_employee_name`` LEFT JOINs users on employee_id so each row also
+    carries ``employee_name`` for the history log, in the same statement.
+    Pages are keyed on ``id > last_id`` so memory stays O(_PAGE_SIZE); each
+    page's diffs are written with one executemany UPDATE-by-id before the
+    next page is read. ``only_missing`` restricts the scan to rows that have
+    a source value but no hash yet, so a rerun only touches new rows (stale
+    hashes are then left alone).
+    ``hash_value`` lets a run share one memoized hasher across tables.
+    Yields ``[(row, [(field, old_hash, new_hash), ...]), ...]`` per page for
+    the rows that changed.
+    """
+    if not fields:
         return
-    log_hash_history(
-        entity_type=entity_type,
-        entity_id=entity_id,
-        field_name=field_name,
-        old_hash=old_hash,
-        new_hash=new_hash,
-        actor_id=None,
-        actor_name="system_backfill",
-        employee_name=employee_name,
-        details=details,
+    hash_attrs = tuple(f"{field}_hash" for field in fields)
+    width = len(fields)
+    t = table(model.__tablename__, column("id"), *(column(name) for name in fields + hash_attrs))
+    base_stmt = select(t)
+    if with_employee_name:
+        users = User.__table__
+        base_stmt = base_stmt.add_columns(users.c.name.label("employee_name")).select_from(
+            t.outerjoin(users, users.c.employee_id == t.c.employee_id)
+        )
+    if only_missing:
+        base_stmt = base_stmt.where(
+            or_(
+                *(
+                    and_(t.c[field].isnot(None), t.c[hash_attr].is_(None))
+                    for field, hash_attr in zip(fields, hash_attrs)
+                )
+            )
+        )
+    base_stmt = base_stmt.order_by(t.c.id).limit(_PAGE_SIZE)
+    update_stmt = update(t).where(t.c.id == bindparam("b_id")).values(
+        {hash_attr: bindparam(f"b_{hash_attr}") for hash_attr in hash_attrs}
     )
 
+    sources_of, diff_row = _row_functions(fields)
+    last_id = None
+    while True:
+        stmt = base_stmt if last_id is None else base_stmt.where(t.c.id > last_id)
+        rows = db.execute(stmt).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+
+        sources = [v for row in rows for v in sources_of(row)]
+        digests = [hash_value(v) if v else None for v in sources]
+
+        changed = []
+        params = []
+        for i, row in enumerate(rows):
+            diff = diff_row(row, digests, i * width)
+            if diff is not None:
+                changed.append((row, diff[0]))
+                params.append(diff[1])
+
+        if params:
+            db.execute(update_stmt, params)
+        yield changed
+
+
+@functools.lru_cache(maxsize=None)
+def _row_functions(fields: tuple[str, ...]):
+    """Generate ``sources_of(row)`` and ``diff_row(row, digests, base)`` for ``fields``.
+
+    The generated code reads ``row.<field>`` / ``row.<field>_hash`` directly
+    instead of looping with getattr() per field per row. ``diff_row`` compares
+    the old and new hash tuples once and only walks fields for rows that
+    differ; it returns ``(changes, update_params)`` or None when current.
+    """
+    for field in fields:
+        if not field.isidentifier():
+            raise ValueError(f"Invalid field name: {field!r}")
+    width = len(fields)
+    olds = "".join(f"row.{field}_hash, " for field in fields)
+    values = ", ".join(f"{f'b_{field}_hash'!r}: new[{j}]" for j, field in enumerate(fields))
+    lines = [
+        f"FIELDS = {fields!r}",
+        "",
+        "def sources_of(row):",
+        f"    return ({''.join(f'row.{f}, ' for f in fields)})",
+        "",
+        "def diff_row(row, d, base):",
+        f"    new = tuple(d[base:base + {width}])",
+        f"    old = ({olds})",
+        "    if old == new:",
+        "        return None",
+        f"    changes = [(FIELDS[i], old[i], new[i]) for i in range({width}) if old[i] != new[i]]",
+        f"    return changes, {{'b_id': row.id, {values}}}",
+    ]
+    namespace: dict = {}
+    exec("\n".join(lines), namespace)
+    return namespace["sources_of"], namespace["diff_row"]
+
+
+def _queue_history(entries, timestamp, entity_type, entity_id, field_name, old_hash, new_hash, employee_name):
+    # Positional and check-free: callers only pass fields that changed.
+    entries.append({
+        "timestamp": timestamp,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "field_name": field_name,
+        "old_hash": old_hash,
+        "new_hash": new_hash,
+        "actor_id": None,
+        "actor_name": "system_backfill",
+        "employee_name": employee_name,
+        "details": "backfill",
+    })
+
 
-def backfill_hashes() -> dict[str, int]:
-    db = SessionLocal()
-    updated = {
-        "users": 0,
-        "attendance": 0,
-        "removed_employees": 0,
-        "unknown_rfids": 0,
-        "rooms": 0,
-        "departments": 0,
-        "tasks": 0,
-        "leave_requests": 0,
-        "teams": 0,
-    }
-
-    try:
-        for user in db.query(User).all():
-            changed = False
-            old_employee_id_hash = user.employee_id_hash
-            old_name_hash = user.name_hash
-            old_email_hash = user.email_hash
-            old_rfid_tag_hash = user.rfid_tag_hash
-            old_role_hash = user.role_hash
-            old_department_hash = user.department_hash
-            changed |= _set_hash(user, "employee_id_hash", "employee_id")
-            changed |= _set_hash(user, "name_hash", "name")
-            changed |= _set_hash(user, "email_hash", "email")
-            changed |= _set_hash(user, "rfid_tag_hash", "rfid_tag")
-            changed |= _set_hash(user, "role_hash", "role")
-            changed |= _set_hash(user, "department_hash", "department")
-            if changed:
-                updated["users"] += 1
-                _maybe_log_history(entity_type="User", entity_id=user.employee_id, field_name="employee_id",
-                                   old_hash=old_employee_id_hash, new_hash=user.employee_id_hash,
-                                   employee_name=user.name, details="backfill")
-                _maybe_log_history(entity_type="User", entity_id=user.employee_id, field_name="name",
-                                   old_hash=old_name_hash, new_hash=user.name_hash,
-                                   employee_name=user.name, details="backfill")
-                _maybe_log_history(entity_type="User", entity_id=user.employee_id, field_name="email",
-                                   old_hash=old_email_hash, new_hash=user.email_hash,
-                                   employee_name=user.name, details="backfill")
-                _maybe_log_history(entity_type="User", entity_id=user.employee_id, field_name="rfid_tag",
-                                   old_hash=old_rfid_tag_hash, new_hash=user.rfid_tag_hash,
-                                   employee_name=user.name, details="backfill")
-                _maybe_log_history(entity_type="User", entity_id=user.employee_id, field_name="role",
-                                   old_hash=old_role_hash, new_hash=user.role_hash,
-                                   employee_name=user.name, details="backfill")
-                _maybe_log_history(entity_type="User", entity_id=user.employee_id, field_name="department",
-                                   old_hash=old_department_hash, new_hash=user.department_hash,
-                                   employee_name=user.name, details="backfill")
-
-        for attendance in db.query(Attendance).all():
-            changed = False
-            old_employee_id_hash = attendance.employee_id_hash
-            old_status_hash = attendance.status_hash
-            old_location_hash = attendance.location_name_hash
-            old_room_hash = attendance.room_no_hash
-            changed |= _set_hash(attendance, "employee_id_hash", "employee_id")
-            changed |= _set_hash(attendance, "status_hash", "status")
-            changed |= _set_hash(attendance, "location_name_hash", "location_name")
-            changed |= _set_hash(attendance, "room_no_hash", "room_no")
-            if changed:
-                updated["attendance"] += 1
-                _maybe_log_history(entity_type="Attendance", entity_id=str(attendance.id), field_name="employee_id",
-                                   old_hash=old_employee_id_hash, new_hash=attendance.employee_id_hash,
-                                   employee_name=attendance.user.name if attendance.user else None, details="backfill")
-                _maybe_log_history(entity_type="Attendance", entity_id=str(attendance.id), field_name="status",
-                                   old_hash=old_status_hash, new_hash=attendance.status_hash,
-                                   employee_name=attendance.user.name if attendance.user else None, details="backfill")
-                _maybe_log_history(entity_type="Attendance", entity_id=str(attendance.id), field_name="location_name",
-                                   old_hash=old_location_hash, new_hash=attendance.location_name_hash,
-                                   employee_name=attendance.user.name if attendance.user else None, details="backfill")
-                _maybe_log_history(entity_type="Attendance", entity_id=str(attendance.id), field_name="room_no",
-                                   old_hash=old_room_hash, new_hash=attendance.room_no_hash,
-                                   employee_name=attendance.user.name if attendance.user else None, details="backfill")
-
-        for removed in db.query(RemovedEmployee).all():
-            changed = False
-            old_employee_id_hash = removed.employee_id_hash
-            old_name_hash = removed.name_hash
-            old_email_hash = removed.email_hash
-            old_rfid_tag_hash = removed.rfid_tag_hash
-            old_role_hash = removed.role_hash
-            old_department_hash = removed.department_hash
-            changed |= _set_hash(removed, "employee_id_hash", "employee_id")
-            changed |= _set_hash(removed, "name_hash", "name")
-            changed |= _set_hash(removed, "email_hash", "email")
-            changed |= _set_hash(removed, "rfid_tag_hash", "rfid_tag")
-            changed |= _set_hash(removed, "role_hash", "role")
-            changed |= _set_hash(removed, "department_hash", "department")
-            if changed:
-                updated["removed_employees"] += 1
-                _maybe_log_history(entity_type="RemovedEmployee", entity_id=removed.employee_id, field_name="employee_id",
-                                   old_hash=old_employee_id_hash, new_hash=removed.employee_id_hash,
-                                   employee_name=removed.name, details="backfill")
-                _maybe_log_history(entity_type="RemovedEmployee", entity_id=removed.employee_id, field_name="name",
-                                   old_hash=old_name_hash, new_hash=removed.name_hash,
-                                   employee_name=removed.name, details="backfill")
-                _maybe_log_history(entity_type="RemovedEmployee", entity_id=removed.employee_id, field_name="email",
-                                   old_hash=old_email_hash, new_hash=removed.email_hash,
-                                   employee_name=removed.name, details="backfill")
-                _maybe_log_history(entity_type="RemovedEmployee", entity_id=removed.employee_id, field_name="rfid_tag",
-                                   old_hash=old_rfid_tag_hash, new_hash=removed.rfid_tag_hash,
-                                   employee_name=removed.name, details="backfill")
-                _maybe_log_history(entity_type="RemovedEmployee", entity_id=removed.employee_id, field_name="role",
-                                   old_hash=old_role_hash, new_hash=removed.role_hash,
-                                   employee_name=removed.name, details="backfill")
-                _maybe_log_history(entity_type="RemovedEmployee", entity_id=removed.employee_id, field_name="department",
-                                   old_hash=old_department_hash, new_hash=removed.department_hash,
-                                   employee_name=removed.name, details="backfill")
-
-        for unknown in db.query(UnknownRFID).all():
-            changed = False
-            old_rfid_tag_hash = unknown.rfid_tag_hash
-            old_location_hash = unknown.location_hash
-            changed |= _set_hash(unknown, "rfid_tag_hash", "rfid_tag")
-            changed |= _set_hash(unknown, "location_hash", "location")
-            if changed:
-                updated["unknown_rfids"] += 1
-                _maybe_log_history(entity_type="UnknownRFID", entity_id=unknown.rfid_tag, field_name="rfid_tag",
-                                   old_hash=old_rfid_tag_hash, new_hash=unknown.rfid_tag_hash,
-                                   employee_name=None, details="backfill")
-                _maybe_log_history(entity_type="UnknownRFID", entity_id=unknown.rfid_tag, field_name="location",
-                                   old_hash=old_location_hash, new_hash=unknown.location_hash,
-                                   employee_name=None, details="backfill")
-
-        for room in db.query(Room).all():
-            changed = False
-            old_room_id_hash = room.room_id_hash
-            old_room_no_hash = room.room_no_hash
-            old_location_hash = room.location_name_hash
-            changed |= _set_hash(room, "room_id_hash", "room_id")
-            changed |= _set_hash(room, "room_no_hash", "room_no")
-            changed |= _set_hash(room, "location_name_hash", "location_name")
-            if changed:
-                updated["rooms"] += 1
-                _maybe_log_history(entity_type="Room", entity_id=room.room_id, field_name="room_id",
-                                   old_hash=old_room_id_hash, new_hash=room.room_id_hash,
-                                   employee_name=None, details="backfill")
-                _maybe_log_history(entity_type="Room", entity_id=room.room_id, field_name="room_no",
-                                   old_hash=old_room_no_hash, new_hash=room.room_no_hash,
-                                   employee_name=None, details="backfill")
-                _maybe_log_history(entity_type="Room", entity_id=room.room_id, field_name="location_name",
-                                   old_hash=old_location_hash, new_hash=room.location_name_hash,
-                                   employee_name=None, details="backfill")
-
-        for department in db.query(Department).all():
-            changed = False
-            old_name_hash = department.name_hash
-            changed |= _set_hash(department, "name_hash", "name")
-            if changed:
-                updated["departments"] += 1
-                _maybe_log_history(entity_type="Department", entity_id=department.name, field_name="name",
-                                   old_hash=old_name_hash, new_hash=department.name_hash,
-                                   employee_name=None, details="backfill")
-
-        for task in db.query(Task).all():
-            changed = False
-            old_user_id_hash = task.user_id_hash
-            old_title_hash = task.title_hash
-            old_status_hash = task.status_hash
-            old_priority_hash = task.priority_hash
-            changed |= _set_hash(task, "user_id_hash", "user_id")
-            changed |= _set_hash(task, "title_hash", "title")
-            changed |= _set_hash(task, "status_hash", "status")
-            changed |= _set_hash(task, "priority_hash", "priority")
-            if changed:
-                updated["tasks"] += 1
-                _maybe_log_history(entity_type="Task", entity_id=str(task.id), field_name="user_id",
-                                   old_hash=old_user_id_hash, new_hash=task.user_id_hash,
-                                   employee_name=None, details="backfill")
-                _maybe_log_history(entity_type="Task", entity_id=str(task.id), field_name="title",
-                                   old_hash=old_title_hash, new_hash=task.title_hash,
-                                   employee_name=None, details="backfill")
-                _maybe_log_history(entity_type="Task", entity_id=str(task.id), field_name="status",
-                                   old_hash=old_status_hash, new_hash=task.status_hash,
-                                   employee_name=None, details="backfill")
-                _maybe_log_history(entity_type="Task", entity_id=str(task.id), field_name="priority",
-                                   old_hash=old_priority_hash, new_hash=task.priority_hash,
-                                   employee_name=None, details="backfill")
-
-        for leave in db.query(LeaveRequest).all():
-            changed = False
-            old_employee_id_hash = leave.employee_id_hash
-            old_reason_hash = leave.reason_hash
-            old_status_hash = leave.status_hash
-            changed |= _set_hash(leave, "employee_id_hash", "employee_id")
-            changed |= _set_hash(leave, "reason_hash", "reason")
-            changed |= _set_hash(leave, "status_hash", "status")
-            if changed:
-                updated["leave_requests"] += 1
-                _maybe_log_history(entity_type="LeaveRequest", entity_id=str(leave.id), field_name="employee_id",
-                                   old_hash=old_employee_id_hash, new_hash=leave.employee_id_hash,
-                                   employee_name=leave.user.name if leave.user else None, details="backfill")
-                _maybe_log_history(entity_type="LeaveRequest", entity_id=str(leave.id), field_name="reason",
-                                   old_hash=old_reason_hash, new_hash=leave.reason_hash,
-                                   employee_name=leave.user.name if leave.user else None, details="backfill")
-                _maybe_log_history(entity_type="LeaveRequest", entity_id=str(leave.id), field_name="status",
-                                   old_hash=old_status_hash, new_hash=leave.status_hash,
-                                   employee_name=leave.user.name if leave.user else None, details="backfill")
-
-        for team in db.query(Team).all():
-            changed = False
-            old_name_hash = team.name_hash
-            old_department_hash = team.department_hash
-            changed |= _set_hash(team, "name_hash", "name")
-            changed |= _set_hash(team, "department_hash", "department")
-            if changed:
-                updated["teams"] += 1
-                _maybe_log_history(entity_type="Team", entity_id=str(team.id), field_name="name",
-                                   old_hash=old_name_hash, new_hash=team.name_hash,
-                                   employee_name=None, details="backfill")
-                _maybe_log_history(entity_type="Team", entity_id=str(team.id), field_name="department",
-                                   old_hash=old_department_hash, new_hash=team.department_hash,
-                                   employee_name=None, details="backfill")
-
-        db.commit()
-        return updated
-    finally:
-        db.close()
+def _no_name(row) -> None:
+    return None
+
+
+# (result key, model, history entity_type, hashed fields, entity_id(row),
+#  employee_name(row), LEFT JOIN users for employee_name)
+# Row accessors for each field set are generated once, at import, below.
+MODEL_SPECS = (
+    ("users", User, "User", ("employee_id", "name", "email", "rfid_tag", "role", "department"),
+     lambda r: r.employee_id, lambda r: r.name, False),
+    ("attendance", Attendance, "Attendance", ("employee_id", "status", "location_name", "room_no"),
+     lambda r: str(r.id), lambda r: r.employee_name, True),
+    ("removed_employees", RemovedEmployee, "RemovedEmployee",
+     ("employee_id", "name", "email", "rfid_tag", "role", "department"),
+     lambda r: r.employee_id, lambda r: r.name, False),
+    ("unknown_rfids", UnknownRFID, "UnknownRFID", ("rfid_tag", "location"),
+     lambda r: r.rfid_tag, _no_name, False),
+    ("rooms", Room, "Room", ("room_id", "room_no", "location_name"),
+     lambda r: r.room_id, _no_name, False),
+    ("departments", Department, "Department", ("name",),
+     lambda r: r.name, _no_name, False),
+    ("tasks", Task, "Task", ("user_id", "title", "status", "priority"),
+     lambda r: str(r.id), _no_name, False),
+    ("leave_requests", LeaveRequest, "LeaveRequest", ("employee_id", "reason", "status"),
+     lambda r: str(r.id), lambda r: r.employee_name, True),
+    ("teams", Team, "Team", ("name", "department"),
+     lambda r: str(r.id), _no_name, False),
+)
+
+
+for _spec in MODEL_SPECS:
+    _row_functions(_spec[3])
+
+
+def _existing_hash_fields(bind) -> dict[str, tuple[str, ...]]:
+    """Per result key, the spec fields whose source and hash columns exist.
+
+    One batched reflection; tables without add_hash_columns applied (or
+    missing entirely) get an empty tuple and are skipped.
+    """
+    tables = [spec[1].__tablename__ for spec in MODEL_SPECS]
+    reflected = inspect(bind).get_multi_columns(filter_names=tables)
+    existing = {name: {c["name"] for c in cols} for (_, name), cols in reflected.items()}
+    result = {}
+    for spec in MODEL_SPECS:
+        columns = existing.get(spec[1].__tablename__, set())
+        result[spec[0]] = tuple(f for f in spec[3] if f in columns and f"{f}_hash" in columns)
+    return result
+
+
+def _backfill_model(db, spec: tuple, fields: tuple[str, ...], only_missing: bool, hash_value=_sha256_text) -> int:
+    """Backfill one model's hashes and history; returns the number of rows changed."""
+    _, model, entity_type, _, entity_id, employee_name, with_employee_name = spec
+    updated = 0
+    history: list = []
+    queue = _queue_history
+    for changed in _backfill_table(
+        db, model, fields,
+        with_employee_name=with_employee_name, only_missing=only_missing, hash_value=hash_value,
+    ):
+        updated += len(changed)
+        ts = history_timestamp()
+        for row, changes in changed:
+            row_id, row_name = entity_id(row), employee_name(row)
+            for field_name, old_hash, new_hash in changes:
+                queue(history, ts, entity_type, row_id, field_name, old_hash, new_hash, row_name)
+        log_hash_history_batch(history, db)
+        history.clear()
+    return updated
+
+
+def _backfill_model_in_own_session(spec: tuple, fields: tuple[str, ...], only_missing: bool, hash_value) -> int:
+    with SessionLocal() as db, db.begin():
+        return _backfill_model(db, spec, fields, only_missing, hash_value)
+
+
+def backfill_hashes(only_missing: bool = False, workers: int = 1) -> dict[str, int]:
+    """Recompute and fix every hash; ``only_missing=True`` just fills empty ones.
+
+    With ``workers > 1`` the models are backfilled concurrently, each in its
+    own session and transaction (a failure no longer rolls back the other
+    tables). SQLite always runs single-threaded.
+    """
+    # Roles, statuses, departments, locations repeat across rows; a bounded
+    # per-run memo turns most of their hashes into a dict lookup.
+    hash_value = functools.lru_cache(maxsize=_HASH_MEMO_SIZE)(_sha256_text)
+    fields = _existing_hash_fields(engine)
+
+    if workers > 1 and engine.dialect.name != "sqlite":
+        with ThreadPoolExecutor(max_workers=min(workers, len(MODEL_SPECS))) as pool:
+            futures = {
+                spec[0]: pool.submit(_backfill_model_in_own_session, spec, fields[spec[0]], only_missing, hash_value)
+                for spec in MODEL_SPECS
+            }
+            return {key: future.result() for key, future in futures.items()}
+
+    # One explicit transaction for every model: committed on success, rolled
+    # back if any table fails, so hashes and their history land together.
+    with SessionLocal() as db, db.begin():
+        return {
+            spec[0]: _backfill_model(db, spec, fields[spec[0]], only_missing, hash_value)
+            for spec in MODEL_SPECS
+        }
 
 
 def main() -> None:
-    updated = backfill_hashes()
+    updated = backfill_hashes(
+        only_missing=get_bool("BACKFILL_ONLY_MISSING", False),
+        workers=get_int("BACKFILL_WORKERS", 1),
+    )
     print("Hash backfill complete:")
     for key, value in updated.items():
         print(f"- {key}: {value}")
@@ -12,11 +12,12 @@ WHY:
 - Prevents forged cross-site form submissions.
 
 HOW:
-- Verifies header/form token matches session token.
+- Verifies header/form token matches session token (constant-time).
 """
 
 from __future__ import annotations
 
+import hmac
 import secrets
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
@@ -38,6 +39,8 @@ class CSRFMiddleware(BaseHTTPMiddleware):
         self.cookie_name = cookie_name
         self.enabled = enabled
         self.exempt_paths = exempt_paths or []
+        # str.startswith(tuple) also covers exact matches.
+        self._exempt_prefixes = tuple(self.exempt_paths)
 
     async def dispatch(self, request, call_next):
         if not self.enabled:
@@ -57,22 +60,22 @@ class CSRFMiddleware(BaseHTTPMiddleware):
                 request.scope["session"] = session
 
         if request.method not in SAFE_METHODS:
-            path = request.url.path
-            if any(path == p or path.startswith(p) for p in self.exempt_paths):
+            if request.url.path.startswith(self._exempt_prefixes):
                 return await call_next(request)
-            form = None
-            try:
-                if request.headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
-                    form = await request.form()
-            except Exception:
-                form = None
-
-            header_token = request.headers.get("x-csrf-token")
-            form_token = form.get("csrf_token") if form else None
-            if not header_token and not form_token:
+            presented = request.headers.get("x-csrf-token")
+            if not presented:
+                # Only buffer and parse the body when the header is absent.
+                try:
+                    if request.headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+                        form = await request.form()
+                        presented = form.get("csrf_token")
+                except Exception:
+                    presented = None
+            if not presented:
                 increment_feature_event("csrf")
                 return JSONResponse({"detail": "CSRF token missing"}, status_code=403)
-            if (header_token or form_token) != token:
+            # Constant-time compare; bytes so non-ASCII input can't raise TypeError.
+            if not hmac.compare_digest(str(presented).encode("utf-8"), token.encode("utf-8")):
                 increment_feature_event("csrf")
                 return JSONResponse({"detail": "CSRF token invalid"}, status_code=403)
 
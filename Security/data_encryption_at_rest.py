@@ -12,17 +12,25 @@ WHY:
 
 HOW:
 - Uses AES-256-GCM with random nonce per value.
+- AESGCM objects are cached per key so OpenSSL's key schedule is reused.
 """
 
 from __future__ import annotations
 
 import base64
+import functools
 import os
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 
 NONCE_SIZE = 12
 TOKEN_PREFIX = "enc::"
+_PREFIX_LEN = len(TOKEN_PREFIX)
+
+
+@functools.lru_cache(maxsize=8)
+def _get_aesgcm(key: bytes) -> AESGCM:
+    return AESGCM(key)
 
 
 def encrypt_bytes(plaintext: bytes, key: bytes) -> str:
@@ -30,10 +38,9 @@ def encrypt_bytes(plaintext: bytes, key: bytes) -> str:
     if len(key) != 32:
         raise ValueError("AES-256 key must be 32 bytes")
     nonce = os.urandom(NONCE_SIZE)
-    aesgcm = AESGCM(key)
-    ciphertext = aesgcm.encrypt(nonce, plaintext, None)
-    token = base64.urlsafe_b64encode(nonce + ciphertext).decode("utf-8")
-    return f"{TOKEN_PREFIX}{token}"
+    ciphertext = _get_aesgcm(key).encrypt(nonce, plaintext, None)
+    # Base64 output is pure ASCII; decode it once and prefix.
+    return TOKEN_PREFIX + base64.urlsafe_b64encode(nonce + ciphertext).decode("ascii")
 
 
 def decrypt_bytes(token: str, key: bytes) -> bytes:
@@ -42,7 +49,6 @@ def decrypt_bytes(token: str, key: bytes) -> bytes:
         raise ValueError("AES-256 key must be 32 bytes")
     if not token.startswith(TOKEN_PREFIX):
         return token.encode("utf-8")
-    raw = base64.urlsafe_b64decode(token[len(TOKEN_PREFIX):].encode("utf-8"))
+    raw = base64.urlsafe_b64decode(token[_PREFIX_LEN:])
     nonce, ciphertext = raw[:NONCE_SIZE], raw[NONCE_SIZE:]
-    aesgcm = AESGCM(key)
-    return aesgcm.decrypt(nonce, ciphertext, None)
+    return _get_aesgcm(key).decrypt(nonce, ciphertext, None)
@@ -23,6 +23,11 @@ from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 
+_HTML_TAG_RE = re.compile(r"<[^>]*>")
+# Deletes C0 controls except tab, LF and CR (same set as [\x00-\x08\x0b\x0c\x0e-\x1f]).
+_CTRL_TABLE = dict.fromkeys([*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20)])
+
+
 def safe_text(query: str):
     """Return SQLAlchemy text() for parameterized queries (DB-agnostic)."""
     return text(query)
@@ -41,6 +46,5 @@ def sanitize_db_text(value: str | None, max_len: int = 200) -> str | None:
     if value is None:
         return None
     value = value.strip()[:max_len]
-    value = re.sub(r"<[^>]*>", "", value)
-    value = re.sub(r"[\x00-\x08\x0b\x0c\x0e-\x1f]", "", value)
+    value = _HTML_TAG_RE.sub("", value).translate(_CTRL_TABLE)
     return value or None
@@ -1,44 +1,85 @@
 from __future__ import annotations
 
+import atexit
 import json
+import logging
+import operator
 import os
 import datetime
+import queue
+import threading
+import time
 from typing import Any
 
+from Security.security_config import get_bool, get_int
+
+try:
+    import orjson as _orjson
+except Exception:  # pragma: no cover
+    _orjson = None
+
+
+if _orjson is not None:
+    _dumps = _orjson.dumps
+    _loads = _orjson.loads
+    _DECODE_ERRORS: tuple[type[Exception], ...] = (_orjson.JSONDecodeError,)
+else:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    _loads = json.loads
+    _DECODE_ERRORS = (json.JSONDecodeError, UnicodeDecodeError)
+
 
 _LOG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs", "hash_history.log")
 
 
+# Serialises appends so concurrent batches never interleave lines.
+_FILE_LOCK = threading.Lock()
+# Long-lived unbuffered O_APPEND handle: one write() per batch, no
+# open/close per call. Opened on first append, closed at exit.
+_WRITER = None
+
+# log_hash_history() only enqueues; a daemon worker drains the queue and
+# writes up to _BATCH_SIZE entries (or whatever arrived within _BATCH_WAIT
+# seconds) with one file append and one executemany INSERT + commit.
+_BATCH_SIZE = max(1, get_int("HASH_HISTORY_BATCH_SIZE", 200))
+_BATCH_WAIT = get_int("HASH_HISTORY_FLUSH_MS", 50) / 1000
+# HASH_HISTORY_SYNC_FILE=true keeps the file append on the caller's path.
+_SYNC_FILE = get_bool("HASH_HISTORY_SYNC_FILE", False)
+_QUEUE: queue.Queue[dict[str, Any]] = queue.Queue(maxsize=10000)
+_STOP = threading.Event()
+_WORKER: threading.Thread | None = None
+_WORKER_LOCK = threading.Lock()
+_LOGGER = logging.getLogger("security.hash_history")
+
+# Bytes read per requested entry when tailing the log file (grows if short).
+_TAIL_BYTES_PER_LINE = 512
+# Column order shared by the file payload, the INSERT rows and table reads.
+_COLS = (
+    "timestamp", "entity_type", "entity_id", "field_name", "old_hash",
+    "new_hash", "actor_id", "actor_name", "employee_name", "details",
+)
+_COLS_GETTER = operator.itemgetter(*_COLS)
+_NOT_NULL_IDX = tuple(_COLS.index(c) for c in ("timestamp", "entity_type", "field_name"))
+_KEY_FIELDS = _COLS[:6]
+_KEY_GETTER = operator.itemgetter(*_KEY_FIELDS)
+
+
 def _ensure_log_dir() -> None:
     os.makedirs(os.path.dirname(_LOG_PATH), exist_ok=True)
 
 
-def _write_payload_to_db(payload: dict[str, Any]) -> None:
+def _db_row(payload: dict[str, Any]) -> dict[str, Any]:
     try:
-        from app.database import SessionLocal
-        from app.models import SecurityHashHistory
-
-        db = SessionLocal()
-        try:
-            row = SecurityHashHistory(
-                timestamp=str(payload.get("timestamp") or ""),
-                entity_type=str(payload.get("entity_type") or ""),
-                entity_id=(str(payload.get("entity_id")) if payload.get("entity_id") is not None else None),
-                field_name=str(payload.get("field_name") or ""),
-                old_hash=(str(payload.get("old_hash")) if payload.get("old_hash") is not None else None),
-                new_hash=(str(payload.get("new_hash")) if payload.get("new_hash") is not None else None),
-                actor_id=(str(payload.get("actor_id")) if payload.get("actor_id") is not None else None),
-                actor_name=(str(payload.get("actor_name")) if payload.get("actor_name") is not None else None),
-                employee_name=(str(payload.get("employee_name")) if payload.get("employee_name") is not None else None),
-                details=(str(payload.get("details")) if payload.get("details") is not None else None),
-            )
-            db.add(row)
-            db.commit()
-        finally:
-            db.close()
-    except Exception:
-        # Keep logging non-fatal; file logging remains fallback.
-        pass
+        values = _COLS_GETTER(payload)
+    except KeyError:
+        values = tuple(payload.get(c) for c in _COLS)
+    row = [None if v is None else str(v) for v in values]
+    for i in _NOT_NULL_IDX:
+        if not row[i]:
+            row[i] = ""
+    return dict(zip(_COLS, row))
 
 
 def _read_payloads_from_db(limit: int | None = 50) -> list[dict[str, Any]]:
@@ -48,30 +89,22 @@ def _read_payloads_from_db(limit: int | None = 50) -> list[dict[str, Any]]:
 
         db = SessionLocal()
         try:
-            q = db.query(SecurityHashHistory).order_by(SecurityHashHistory.id.desc())
+            q = db.query(*(getattr(SecurityHashHistory, c) for c in _COLS)).order_by(
+                SecurityHashHistory.id.desc()
+            )
             rows = q.all() if limit is None else q.limit(limit).all()
-            return [
-                {
-                    "timestamp": r.timestamp,
-                    "entity_type": r.entity_type,
-                    "entity_id": r.entity_id,
-                    "field_name": r.field_name,
-                    "old_hash": r.old_hash,
-                    "new_hash": r.new_hash,
-                    "actor_id": r.actor_id,
-                    "actor_name": r.actor_name,
-                    "employee_name": r.employee_name,
-                    "details": r.details,
-                }
-                for r in rows
-            ]
+            return [dict(zip(_COLS, r)) for r in rows]
         finally:
             db.close()
     except Exception:
         return []
 
 
-def log_hash_history(
+def history_timestamp() -> str:
+    return datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
+
+
+def hash_history_payload(
     *,
     entity_type: str,
     entity_id: str | None,
@@ -82,10 +115,9 @@ def log_hash_history(
     actor_name: str | None,
     employee_name: str | None = None,
     details: str | None = None,
-) -> None:
-    _ensure_log_dir()
-    payload = {
-        "timestamp": datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC"),
+) -> dict[str, Any]:
+    return {
+        "timestamp": history_timestamp(),
         "entity_type": entity_type,
         "entity_id": entity_id,
         "field_name": field_name,
@@ -96,37 +128,223 @@ def log_hash_history(
         "employee_name": employee_name,
         "details": details,
     }
-    with open(_LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(json.dumps(payload, ensure_ascii=False) + "\n")
-    _write_payload_to_db(payload)
+
+
+def log_hash_history(
+    *,
+    entity_type: str,
+    entity_id: str | None,
+    field_name: str,
+    old_hash: str | None,
+    new_hash: str | None,
+    actor_id: str | None,
+    actor_name: str | None,
+    employee_name: str | None = None,
+    details: str | None = None,
+) -> None:
+    payload = hash_history_payload(
+        entity_type=entity_type,
+        entity_id=entity_id,
+        field_name=field_name,
+        old_hash=old_hash,
+        new_hash=new_hash,
+        actor_id=actor_id,
+        actor_name=actor_name,
+        employee_name=employee_name,
+        details=details,
+    )
+    if _SYNC_FILE:
+        _append_to_file([payload])
+    _start_worker()
+    try:
+        _QUEUE.put_nowait(payload)
+    except queue.Full:
+        # Worker is behind: write inline rather than drop history.
+        _write_batch([payload])
+
+
+def _append_to_file(payloads: list[dict[str, Any]]) -> None:
+    global _WRITER
+    data = b"".join(_dumps(p) + b"\n" for p in payloads)
+    with _FILE_LOCK:
+        if _WRITER is None:
+            _ensure_log_dir()
+            _WRITER = open(_LOG_PATH, "ab", buffering=0)
+        try:
+            _WRITER.write(data)
+        except OSError:
+            # Handle went bad (e.g. disk/remount); reopen once and retry.
+            _WRITER.close()
+            _WRITER = open(_LOG_PATH, "ab", buffering=0)
+            _WRITER.write(data)
+
+
+def _insert_rows(payloads: list[dict[str, Any]], db=None) -> None:
+    from sqlalchemy import insert
+    from app.models import SecurityHashHistory
+
+    # Append-only table: a Core executemany INSERT skips the ORM mapper and
+    # unit of work entirely.
+    stmt = insert(SecurityHashHistory.__table__)
+    rows = [_db_row(p) for p in payloads]
+    if db is not None:
+        db.execute(stmt, rows)
+        return
+    try:
+        from app.database import SessionLocal
+
+        own = SessionLocal()
+        try:
+            own.execute(stmt, rows)
+            own.commit()
+        finally:
+            own.close()
+    except Exception:
+        # Keep logging non-fatal; file logging remains fallback.
+        _LOGGER.warning("hash history: table insert failed for %d entries", len(payloads), exc_info=True)
+
+
+def _write_batch(payloads: list[dict[str, Any]]) -> None:
+    if not _SYNC_FILE:
+        try:
+            _append_to_file(payloads)
+        except OSError:
+            # Still try the table so the batch isn't lost from both sinks.
+            _LOGGER.exception("hash history: file append failed for %d entries", len(payloads))
+    _insert_rows(payloads)
+
+
+def _write_batch_logged(batch: list[dict[str, Any]]) -> None:
+    try:
+        _write_batch(batch)
+    except Exception:
+        _LOGGER.exception("hash history: dropped a batch of %d entries", len(batch))
+
+
+def _drain() -> None:
+    while not (_STOP.is_set() and _QUEUE.empty()):
+        try:
+            batch = [_QUEUE.get(timeout=0.5)]
+        except queue.Empty:
+            continue
+        deadline = time.monotonic() + _BATCH_WAIT
+        while len(batch) < _BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_QUEUE.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _write_batch_logged(batch)
+
+
+def _flush_pending() -> None:
+    """Write whatever is still queued on the calling thread."""
+    batch: list[dict[str, Any]] = []
+    while True:
+        try:
+            batch.append(_QUEUE.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        _write_batch_logged(batch)
+
+
+def _start_worker() -> None:
+    global _WORKER
+    if _WORKER is not None:
+        return
+    with _WORKER_LOCK:
+        if _WORKER is None:
+            _WORKER = threading.Thread(target=_drain, name="hash-history-writer", daemon=True)
+            _WORKER.start()
+
+
+@atexit.register
+def _stop_worker() -> None:
+    global _WRITER
+    _STOP.set()
+    if _WORKER is not None:
+        _WORKER.join(timeout=5)
+    # Worker missed the deadline or died: don't leave entries in the queue.
+    _flush_pending()
+    with _FILE_LOCK:
+        if _WRITER is not None:
+            _WRITER.close()
+            _WRITER = None
+
+
+def log_hash_history_batch(payloads: list[dict[str, Any]], db=None) -> None:
+    """Append many history entries with one file write and one executemany INSERT.
+
+    With ``db`` the rows join the caller's transaction (caller commits);
+    otherwise a short-lived session is used and committed.
+    """
+    if not payloads:
+        return
+    _append_to_file(payloads)
+    _insert_rows(payloads, db)
+
+
+def _tail_lines(limit: int) -> list[bytes]:
+    """Return up to the last ``limit`` non-empty lines of the log file.
+
+    Reads backwards from the end in growing windows instead of parsing the
+    whole file; the first line of a window that doesn't start at offset 0
+    may be partial and is dropped.
+    """
+    with open(_LOG_PATH, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        window = max(limit, 1) * _TAIL_BYTES_PER_LINE
+        while True:
+            start = max(0, size - window)
+            f.seek(start)
+            lines = f.read(size - start).splitlines()
+            if start > 0:
+                lines = lines[1:]
+            lines = [line for line in lines if line.strip()]
+            if len(lines) >= limit or start == 0:
+                return lines[-limit:] if limit else []
+            window *= 2
+
+
+def _history_key(entry: dict[str, Any]) -> tuple:
+    try:
+        values = _KEY_GETTER(entry)
+    except KeyError:
+        values = tuple(entry.get(field) for field in _KEY_FIELDS)
+    return tuple("" if v is None else str(v) for v in values)
 
 
 def read_hash_history(limit: int | None = 50) -> list[dict[str, Any]]:
-    db_entries = _read_payloads_from_db(limit=None)
+    """Newest-first history merged from the table and the log file.
+
+    With a ``limit`` both sources are bounded (SQL LIMIT, tail of the file),
+    so at most ~2*limit entries are parsed; ``limit=None`` reads everything.
+    """
+    db_entries = _read_payloads_from_db(limit=limit)
     file_entries: list[dict[str, Any]] = []
     if os.path.exists(_LOG_PATH):
-        with open(_LOG_PATH, "r", encoding="utf-8") as f:
-            lines = [line.strip() for line in f if line.strip()]
+        if limit is None:
+            with open(_LOG_PATH, "rb") as f:
+                lines = [line for line in f if line.strip()]
+        else:
+            lines = _tail_lines(limit)
         for line in lines:
             try:
-                file_entries.append(json.loads(line))
-            except json.JSONDecodeError:
+                file_entries.append(_loads(line))
+            except _DECODE_ERRORS:
                 continue
 
     if not db_entries and not file_entries:
         return []
 
     merged: list[dict[str, Any]] = []
-    seen: set[tuple[str, str, str, str, str, str]] = set()
+    seen: set[tuple] = set()
     for entry in db_entries + file_entries:
-        key = (
-            str(entry.get("timestamp") or ""),
-            str(entry.get("entity_type") or ""),
-            str(entry.get("entity_id") or ""),
-            str(entry.get("field_name") or ""),
-            str(entry.get("old_hash") or ""),
-            str(entry.get("new_hash") or ""),
-        )
+        key = _history_key(entry)
         if key in seen:
             continue
         seen.add(key)
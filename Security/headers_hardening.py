@@ -9,22 +9,38 @@ Extra hardening headers.
 # WHY:
 # - Reduces browser-based attack surface.
 # HOW:
-# - Adds COOP/COEP/CORP and Permissions-Policy headers.
+# - Adds COOP/COEP/CORP and Permissions-Policy headers to the ASGI
+#   http.response.start message (no BaseHTTPMiddleware buffering).
 
 from __future__ import annotations
 
 import os
-from starlette.middleware.base import BaseHTTPMiddleware
-
-
-class HeadersHardeningMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-        response.headers.setdefault("Permissions-Policy", "geolocation=(), microphone=(), camera=()")
-        if os.getenv("COOP_ENABLED", "true").lower() == "true":
-            response.headers.setdefault("Cross-Origin-Opener-Policy", "same-origin")
-        if os.getenv("CORP_ENABLED", "false").lower() == "true":
-            response.headers.setdefault("Cross-Origin-Resource-Policy", "same-origin")
-        if os.getenv("COEP_ENABLED", "false").lower() == "true":
-            response.headers.setdefault("Cross-Origin-Embedder-Policy", "require-corp")
-        return response
+from starlette.datastructures import MutableHeaders
+
+
+class HeadersHardeningMiddleware:
+    def __init__(self, app):
+        self.app = app
+        # Read once at startup instead of three getenv calls per response.
+        self._coop_on = os.getenv("COOP_ENABLED", "true").lower() == "true"
+        self._corp_on = os.getenv("CORP_ENABLED", "false").lower() == "true"
+        self._coep_on = os.getenv("COEP_ENABLED", "false").lower() == "true"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.setdefault("Permissions-Policy", "geolocation=(), microphone=(), camera=()")
+                if self._coop_on:
+                    headers.setdefault("Cross-Origin-Opener-Policy", "same-origin")
+                if self._corp_on:
+                    headers.setdefault("Cross-Origin-Resource-Policy", "same-origin")
+                if self._coep_on:
+                    headers.setdefault("Cross-Origin-Embedder-Policy", "require-corp")
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -15,46 +15,55 @@ WHY:
 
 HOW:
 - Redirects HTTP to HTTPS and sets HSTS.
+- Plain ASGI middleware: headers are added to the http.response.start
+  message, so responses are never buffered through BaseHTTPMiddleware.
 """
 
 from __future__ import annotations
 
 import os
 import ssl
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import URL, Headers
 from starlette.responses import RedirectResponse
 
 
-class HTTPSRedirectMiddleware(BaseHTTPMiddleware):
+_LOOPBACK = frozenset(("127.0.0.1", "::1", "localhost"))
+
+
+class HTTPSRedirectMiddleware:
     """Redirect HTTP to HTTPS using X-Forwarded-Proto when behind a proxy."""
 
     def __init__(self, app, https_port: int | None = None, enabled: bool = True):
-        super().__init__(app)
+        self.app = app
         self.https_port = https_port
         self.enabled = enabled
         self.allow_insecure_localhost = os.getenv("ALLOW_INSECURE_LOCALHOST", "true").lower() == "true"
 
-    async def dispatch(self, request, call_next):
-        if not self.enabled:
-            return await call_next(request)
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
 
         if self.allow_insecure_localhost:
-            client_host = request.client.host if request.client else ""
-            if client_host in {"127.0.0.1", "::1", "localhost"}:
-                return await call_next(request)
-
-        forwarded_proto = request.headers.get("x-forwarded-proto")
-        scheme = forwarded_proto or request.url.scheme
+            client = scope.get("client")
+            client_host = client[0] if client else ""
+            if client_host in _LOOPBACK:
+                await self.app(scope, receive, send)
+                return
+
+        forwarded_proto = Headers(scope=scope).get("x-forwarded-proto")
+        scheme = forwarded_proto or scope.get("scheme", "http")
         if scheme != "https":
-            url = request.url.replace(scheme="https")
+            url = URL(scope=scope).replace(scheme="https")
             if self.https_port:
                 url = url.replace(netloc=f"{url.hostname}:{self.https_port}")
-            return RedirectResponse(url=str(url), status_code=307)
+            await RedirectResponse(url=str(url), status_code=307)(scope, receive, send)
+            return
 
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+class SecurityHeadersMiddleware:
     """Attach security headers including HSTS for HTTPS deployments."""
 
     def __init__(
@@ -66,33 +75,52 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         preload: bool = False,
         headers_enabled: bool = True,
     ):
-        super().__init__(app)
+        self.app = app
         self.hsts_enabled = hsts_enabled
         self.hsts_max_age = hsts_max_age
         self.include_subdomains = include_subdomains
         self.preload = preload
         self.headers_enabled = headers_enabled
 
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-
-        if self.hsts_enabled:
-            hsts = f"max-age={self.hsts_max_age}"
-            if self.include_subdomains:
+        # Header values depend only on these arguments: encode them once.
+        self._hsts: tuple[bytes, bytes] | None = None
+        if hsts_enabled:
+            hsts = f"max-age={hsts_max_age}"
+            if include_subdomains:
                 hsts += "; includeSubDomains"
-            if self.preload:
+            if preload:
                 hsts += "; preload"
-            response.headers["Strict-Transport-Security"] = hsts
-
-        if self.headers_enabled:
-            response.headers.setdefault("X-Content-Type-Options", "nosniff")
-            response.headers.setdefault("X-Frame-Options", "DENY")
-            response.headers.setdefault("Referrer-Policy", "no-referrer")
-            response.headers.setdefault(
-                "Permissions-Policy",
-                "geolocation=(), microphone=(), camera=()",
+            self._hsts = (b"strict-transport-security", hsts.encode("latin-1"))
+        self._default_headers: tuple[tuple[bytes, bytes], ...] = ()
+        if headers_enabled:
+            self._default_headers = (
+                (b"x-content-type-options", b"nosniff"),
+                (b"x-frame-options", b"DENY"),
+                (b"referrer-policy", b"no-referrer"),
+                (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
             )
-        return response
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        hsts = self._hsts
+        defaults = self._default_headers
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                present = {name.lower() for name, _ in headers}
+                if hsts is not None:
+                    if hsts[0] in present:
+                        headers = [h for h in headers if h[0].lower() != hsts[0]]
+                    headers.append(hsts)
+                headers.extend(h for h in defaults if h[0] not in present)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
 
 
 def create_ssl_context(
@@ -9,21 +9,35 @@ Middleware to reject oversized payloads.
 # WHY:
 # - Mitigates large payload attacks and memory abuse.
 # HOW:
-# - Checks Content-Length header before request processing.
+# - Checks Content-Length in the raw ASGI headers before request processing
+#   and answers 413 with a prebuilt response.
 
 from __future__ import annotations
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
+_REJECT_BODY = b'{"detail":"Request too large"}'
+_REJECT_HEADERS = (
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(_REJECT_BODY)).encode("ascii")),
+)
 
 
-class MaxBodySizeMiddleware(BaseHTTPMiddleware):
+class MaxBodySizeMiddleware:
     def __init__(self, app, max_bytes: int = 1024 * 1024):
-        super().__init__(app)
+        self.app = app
         self.max_bytes = max_bytes
 
-    async def dispatch(self, request, call_next):
-        content_length = request.headers.get("content-length")
-        if content_length and int(content_length) > self.max_bytes:
-            return JSONResponse({"detail": "Request too large"}, status_code=413)
-        return await call_next(request)
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    try:
+                        too_large = int(value) > self.max_bytes
+                    except ValueError:
+                        too_large = False
+                    if too_large:
+                        # Fresh dicts: outer middlewares may edit the messages.
+                        await send({"type": "http.response.start", "status": 413, "headers": list(_REJECT_HEADERS)})
+                        await send({"type": "http.response.body", "body": _REJECT_BODY})
+                        return
+                    break
+        await self.app(scope, receive, send)
@@ -6,7 +6,7 @@ Basic validation helpers to reduce injection payloads.
 
 # FLOW:
 # - sanitize_text() strips tags/control characters.
-# - validate_allowlist() enforces regex allowlists.
+# - validate_allowlist() enforces regex allowlists (compiled patterns cached).
 # WHY:
 # - Blocks common injection and formatting abuse.
 # HOW:
@@ -14,21 +14,32 @@ Basic validation helpers to reduce injection payloads.
 
 from __future__ import annotations
 
+import functools
 import re
 
 
+_TAG_RE = re.compile(r"<[^>]*>")
+_CTRL_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
 def sanitize_text(value: str | None, max_len: int = 200) -> str | None:
     if value is None:
         return None
     value = value.strip()[:max_len]
-    value = re.sub(r"<[^>]*>", "", value)
-    value = re.sub(r"[\x00-\x08\x0b\x0c\x0e-\x1f]", "", value)
+    value = _TAG_RE.sub("", value)
+    value = _CTRL_RE.sub("", value)
     return value or None
 
 
+@functools.lru_cache(maxsize=4096)
+def _compile(pattern: str) -> re.Pattern[str]:
+    return re.compile(pattern)
+
+
 def validate_allowlist(value: str | None, pattern: str) -> str | None:
     if value is None:
         return None
-    if not re.fullmatch(pattern, value):
+    if not _compile(pattern).fullmatch(value):
         return None
     return value
+
@@ -11,59 +11,45 @@ Load encryption keys from environment and validate length.
 # - Prevents hard-coded keys and weak secrets.
 # HOW:
 # - Generates and persists a 32-byte key when absent.
+# - Decoded keys are cached per env var until the env value changes;
+#   invalidate_key_cache() forces a reload when keys are rotated or reloaded.
+# - The active .env file is chosen and parsed by security_config (one
+#   mtime-cached dotenv parse); the path is re-resolved at most every 5 seconds.
 
 from __future__ import annotations
 
 import base64
 import os
 import secrets
+import time
 
-import dotenv
+from Security.security_config import _env_path as _resolve_env_path, _load_env_file
 
 
 PLACEHOLDER = "CHANGE_ME_BASE64_32_BYTES"
 
+# (resolved at, path): resolving stats and parses up to two .env files.
+_ENV_PATH_CACHE: tuple[float, str] | None = None
+_ENV_PATH_TTL_SECONDS = 5.0
 
-def _env_name() -> str:
-    env = os.getenv("APP_ENV", "").strip().lower()
-    if env in {"prod", "production"}:
-        root = os.path.dirname(os.path.dirname(__file__))
-        prod_typo = os.path.join(root, ".env.productuion")
-        if os.path.exists(prod_typo):
-            return ".env.productuion"
-        return ".env.production"
-    if env in {"local", "localhost", "dev", "development"}:
-        return ".env.localhost"
-
-    root = os.path.dirname(os.path.dirname(__file__))
-    prod_typo_path = os.path.join(root, ".env.productuion")
-    prod_path = os.path.join(root, ".env.production")
-    local_path = os.path.join(root, ".env.localhost")
-
-    def _is_active(path: str) -> bool:
-        if not os.path.exists(path):
-            return False
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip().startswith("ENV_ACTIVE="):
-                    return line.split("=", 1)[1].strip().strip('"').lower() == "true"
-        return False
-
-    if _is_active(prod_typo_path):
-        return ".env.productuion"
-    if _is_active(prod_path):
-        return ".env.production"
-    return ".env.localhost"
+# env var name -> (raw env value, decoded key)
+_KEY_CACHE: dict[str, tuple[str, bytes]] = {}
 
 
 def _env_path() -> str:
-    root = os.path.dirname(os.path.dirname(__file__))
-    return os.path.join(root, _env_name())
+    global _ENV_PATH_CACHE
+    now = time.monotonic()
+    cached = _ENV_PATH_CACHE
+    if cached is not None and now - cached[0] < _ENV_PATH_TTL_SECONDS:
+        return cached[1]
+    path = _resolve_env_path()
+    _ENV_PATH_CACHE = (now, path)
+    return path
 
 
 def ensure_data_encryption_key(env_name: str = "DATA_ENCRYPTION_KEY") -> str:
     """Ensure a strong base64 AES-256 key exists in .env and environment."""
-    dotenv.load_dotenv(_env_path())
+    _load_env_file(_env_path())
     raw = os.getenv("ENCRYPTION_KEY") or os.getenv(env_name)
     placeholders = {"", PLACEHOLDER, "REPLACE_WITH_BASE64_32_BYTE_KEY", "AUTO_GENERATE"}
     if raw and raw not in placeholders:
@@ -98,10 +84,30 @@ def ensure_data_encryption_key(env_name: str = "DATA_ENCRYPTION_KEY") -> str:
     return encoded
 
 
+def invalidate_key_cache() -> None:
+    """Drop cached keys so the next get_aes256_key() re-reads .env."""
+    global _ENV_PATH_CACHE
+    _ENV_PATH_CACHE = None
+    _KEY_CACHE.clear()
+
+
 def get_aes256_key(env_name: str = "DATA_ENCRYPTION_KEY") -> bytes:
     """Return 32-byte key from base64 env var, auto-generating if missing."""
+    # load_dotenv() never overrides a set variable, so once the key is in the
+    # environment only an env change (or invalidate_key_cache()) can move it.
+    cached = _KEY_CACHE.get(env_name)
+    if cached is not None and cached[0] == (os.getenv("ENCRYPTION_KEY") or os.getenv(env_name)):
+        return cached[1]
+
     raw = ensure_data_encryption_key(env_name)
-    key = base64.urlsafe_b64decode(raw.encode("utf-8"))
+    # 32 bytes always encode to 43 base64 chars plus optional "=" padding, so
+    # bad keys are rejected before decoding. Strip first: .env values and
+    # secret mounts often carry a trailing newline.
+    encoded = raw.strip()
+    if len(encoded.rstrip("=")) != 43:
+        raise ValueError("DATA_ENCRYPTION_KEY must be 32 bytes after base64 decode")
+    key = base64.urlsafe_b64decode(encoded)
     if len(key) != 32:
         raise ValueError("DATA_ENCRYPTION_KEY must be 32 bytes after base64 decode")
+    _KEY_CACHE[env_name] = (raw, key)
     return key
@@ -20,9 +20,11 @@ def create_login_limiter(
     max_attempts: int = 5,
     window_seconds: int = 300,
     lock_seconds: int = 600,
+    max_keys: int = 100_000,
 ) -> LoginRateLimiter:
     return LoginRateLimiter(
         max_attempts=max_attempts,
         window_seconds=window_seconds,
         lock_seconds=lock_seconds,
+        max_keys=max_keys,
     )
@@ -4,10 +4,19 @@ SECURITY METRICS
 Prometheus-backed metrics for security features.
 """
 
+# HOW:
+# - increment_feature_event() bumps a slot in a preallocated int64 array.
+# - flush_feature_events() pushes the deltas into the Prometheus counter;
+#   it runs before /metrics is rendered and when the dashboard snapshots.
+# - Labelled children are looked up once per feature and kept in a dict.
+
 from __future__ import annotations
 
+import array
 import os
-from typing import Dict
+import sys
+import threading
+from typing import Any, Dict
 
 try:
     from prometheus_client import Counter, Gauge
@@ -19,6 +28,19 @@ except Exception:  # pragma: no cover
 _FEATURE_EVENTS = None
 _FEATURE_ENABLED = None
 
+# Hot-path features get fixed slots; anything else is appended on first use.
+_FEATURE_IDS: dict[str, int] = {
+    sys.intern(name): idx
+    for idx, name in enumerate(("activity-logging", "audit-trail", "csrf", "secure-connection"))
+}
+_COUNTS = array.array("q", [0] * len(_FEATURE_IDS))
+_EXPORTED = array.array("q", [0] * len(_FEATURE_IDS))
+_COUNTS_LOCK = threading.Lock()
+
+# feature -> prometheus child for _FEATURE_EVENTS / _FEATURE_ENABLED.
+_EVENT_CHILDREN: dict[str, Any] = {}
+_ENABLED_CHILDREN: dict[str, Any] = {}
+
 
 def _enabled() -> bool:
     return os.getenv("PROMETHEUS_ENABLED", "true").lower() == "true"
@@ -40,31 +62,59 @@ def _init_metrics() -> None:
     )
 
 
+def _feature_index(feature: str) -> int:
+    with _COUNTS_LOCK:
+        idx = _FEATURE_IDS.get(feature)
+        if idx is None:
+            idx = len(_COUNTS)
+            _FEATURE_IDS[sys.intern(feature)] = idx
+            _COUNTS.append(0)
+            _EXPORTED.append(0)
+        return idx
+
+
 def increment_feature_event(feature: str, amount: int = 1) -> None:
+    idx = _FEATURE_IDS.get(feature)
+    if idx is None:
+        idx = _feature_index(feature)
+    with _COUNTS_LOCK:
+        _COUNTS[idx] += amount
+
+
+def flush_feature_events() -> None:
+    """Push counts accumulated since the last flush into Prometheus."""
     _init_metrics()
     if not _FEATURE_EVENTS:
         return
-    _FEATURE_EVENTS.labels(feature=feature).inc(amount)
+    with _COUNTS_LOCK:
+        pending = [
+            (name, _COUNTS[idx] - _EXPORTED[idx])
+            for name, idx in _FEATURE_IDS.items()
+            if _COUNTS[idx] != _EXPORTED[idx]
+        ]
+        _EXPORTED[:] = _COUNTS
+    for name, delta in pending:
+        child = _EVENT_CHILDREN.get(name)
+        if child is None:
+            child = _EVENT_CHILDREN[name] = _FEATURE_EVENTS.labels(feature=name)
+        child.inc(delta)
 
 
 def set_feature_enabled(feature: str, enabled: bool) -> None:
     _init_metrics()
     if not _FEATURE_ENABLED:
         return
-    _FEATURE_ENABLED.labels(feature=feature).set(1 if enabled else 0)
-
-
-def _counter_value(counter, feature: str) -> int:
-    try:
-        return int(counter.labels(feature=feature)._value.get())
-    except Exception:
-        return 0
+    child = _ENABLED_CHILDREN.get(feature)
+    if child is None:
+        child = _ENABLED_CHILDREN[feature] = _FEATURE_ENABLED.labels(feature=feature)
+    child.set(1 if enabled else 0)
 
 
 def get_feature_metrics_snapshot(features: list[str]) -> Dict[str, Dict[str, int]]:
-    _init_metrics()
+    flush_feature_events()
     snapshot: Dict[str, Dict[str, int]] = {}
-    for feature in features:
-        events = _counter_value(_FEATURE_EVENTS, feature) if _FEATURE_EVENTS else 0
-        snapshot[feature] = {"events": events}
+    with _COUNTS_LOCK:
+        for feature in features:
+            idx = _FEATURE_IDS.get(feature)
+            snapshot[feature] = {"events": _COUNTS[idx] if idx is not None else 0}
     return snapshot
@@ -5,83 +5,114 @@ This script reads photos from static/uploads/users/ and stores them in the datab
 
 import os
 import sys
-from pathlib import Path
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import text
+
 from app.database import SessionLocal
-from app.models import User
-from Security.key_management import hash_value as _hash_value
+from Security.data_integrity import sha256_hex as _hash_value
+
+_MIME_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+}
+_COMMIT_EVERY = 50
+
+# photo_data / photo_mime_type are added by add_photo_columns.py and are not
+# mapped on the User model, so they are read and written with plain SQL.
+_SELECT_USERS = text(
+    "SELECT id, employee_id_hash, photo_data IS NOT NULL AS has_photo "
+    "FROM users WHERE employee_id_hash IS NOT NULL"
+)
+_UPDATE_PHOTO = text("UPDATE users SET photo_data = :data, photo_mime_type = :mime WHERE id = :id")
+
+def _commit_batch(db, batch, done) -> int:
+    """Commit pending photos; on failure roll them back and return how many were lost."""
+    lost = 0
+    try:
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        lost = len(batch)
+        done.difference_update(batch)
+        print(f"Error committing {lost} photos, rolled back: {str(e)}")
+    batch.clear()
+    return lost
 
 def migrate_photos_to_db():
     """Migrate photos from filesystem to database"""
-    db = SessionLocal()
     uploads_dir = os.path.join("static", "uploads", "users")
     
     if not os.path.exists(uploads_dir):
         print(f"Uploads directory not found: {uploads_dir}")
         return
     
-    photo_files = os.listdir(uploads_dir)
-    print(f"Found {len(photo_files)} photo files to migrate")
+    db = SessionLocal()
+    # One query up front instead of a lookup per file.
+    users_by_hash = {row.employee_id_hash: row for row in db.execute(_SELECT_USERS)}
     
+    done = set()
+    batch = []
     migrated = 0
     skipped = 0
     
-    for photo_file in photo_files:
-        try:
-            # Extract employee_id from filename (format: employee_id_randomhex.ext)
-            parts = photo_file.rsplit('_', 1)
-            if len(parts) != 2:
-                print(f"Skipped {photo_file}: Invalid filename format")
+    with os.scandir(uploads_dir) as entries:
+        for entry in entries:
+            photo_file = entry.name
+            try:
+                if not entry.is_file():
+                    continue
+                # Extract employee_id from filename (format: employee_id_randomhex.ext)
+                parts = photo_file.rsplit('_', 1)
+                if len(parts) != 2:
+                    print(f"Skipped {photo_file}: Invalid filename format")
+                    skipped += 1
+                    continue
+                
+                employee_id = parts[0]
+                user = users_by_hash.get(_hash_value(employee_id))
+                
+                if not user:
+                    print(f"Skipped {photo_file}: Employee {employee_id} not found")
+                    skipped += 1
+                    continue
+                
+                # Skip if user already has photo_data
+                if user.has_photo or user.id in done:
+                    print(f"Skipped {photo_file}: User already has photo_data in database")
+                    skipped += 1
+                    continue
+                
+                with open(entry.path, 'rb', buffering=0) as f:
+                    photo_bytes = f.read()
+                
+                mime_type = _MIME_TYPES.get(os.path.splitext(photo_file)[1].lower(), "application/octet-stream")
+                # Savepoint per photo: a failure undoes only this photo, not the batch.
+                with db.begin_nested():
+                    db.execute(_UPDATE_PHOTO, {"data": photo_bytes, "mime": mime_type, "id": user.id})
+                
+            except Exception as e:
+                print(f"Error migrating {photo_file}: {str(e)}")
                 skipped += 1
                 continue
             
-            employee_id = parts[0]
-            
-            # Find user by employee_id hash
-            user = db.query(User).filter(User.employee_id_hash == _hash_value(employee_id)).first()
-            
-            if not user:
-                print(f"Skipped {photo_file}: Employee {employee_id} not found")
-                skipped += 1
-                continue
-            
-            # Skip if user already has photo_data
-            if user.photo_data:
-                print(f"Skipped {photo_file}: User already has photo_data in database")
-                skipped += 1
-                continue
-            
-            # Read photo file
-            photo_path = os.path.join(uploads_dir, photo_file)
-            with open(photo_path, 'rb') as f:
-                photo_bytes = f.read()
-            
-            # Determine MIME type from extension
-            ext = os.path.splitext(photo_file)[1].lower()
-            mime_types = {
-                ".jpg": "image/jpeg",
-                ".jpeg": "image/jpeg",
-                ".png": "image/png",
-                ".webp": "image/webp"
-            }
-            mime_type = mime_types.get(ext, "application/octet-stream")
-            
-            # Store in database
-            user.photo_data = photo_bytes
-            user.photo_mime_type = mime_type
-            db.commit()
-            
+            done.add(user.id)
+            batch.append(user.id)
             print(f"Migrated {photo_file} ({len(photo_bytes)} bytes)")
             migrated += 1
             
-        except Exception as e:
-            print(f"Error migrating {photo_file}: {str(e)}")
-            db.rollback()
-            skipped += 1
+            if len(batch) >= _COMMIT_EVERY:
+                lost = _commit_batch(db, batch, done)
+                migrated -= lost
+                skipped += lost
     
+    lost = _commit_batch(db, batch, done)
+    migrated -= lost
+    skipped += lost
     db.close()
     print(f"\n✅ Migration complete: {migrated} photos migrated, {skipped} skipped")
 
@@ -9,40 +9,83 @@ Simple in-memory rate limiting for login attempts.
 # WHY:
 # - Prevents credential stuffing and brute-force attacks.
 # HOW:
-# - In-memory attempt counter with lockout window.
+# - In-memory token bucket per key (two floats) with lockout window.
+# - Buckets are LRU-bounded by max_keys so key enumeration can't grow them
+#   without limit; the least recently failed keys are forgotten first.
+# - Locks are never evicted early (spraying throwaway keys must not unlock a
+#   victim); they are pruned once expired instead.
 
 from __future__ import annotations
 
 import time
-from collections import defaultdict
+from collections import OrderedDict
 
 
 class LoginRateLimiter:
-    def __init__(self, max_attempts: int = 5, window_seconds: int = 300, lock_seconds: int = 600):
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        window_seconds: int = 300,
+        lock_seconds: int = 600,
+        max_keys: int = 100_000,
+    ):
         self.max_attempts = max_attempts
         self.window_seconds = window_seconds
         self.lock_seconds = lock_seconds
-        self._attempts = defaultdict(list)
-        self._locked_until = {}
+        self.max_keys = max_keys
+        # Token bucket per key: (tokens, last_refill). Holds max_attempts
+        # tokens, refills max_attempts per window, and each failure costs one.
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._locked_until: OrderedDict[str, float] = OrderedDict()
 
-    def _cleanup(self, key: str) -> None:
-        now = time.time()
-        self._attempts[key] = [t for t in self._attempts[key] if now - t <= self.window_seconds]
-        if key in self._locked_until and now >= self._locked_until[key]:
-            del self._locked_until[key]
+    def _remember(self, store: OrderedDict, key: str, value) -> None:
+        store[key] = value
+        store.move_to_end(key)
+        if len(store) > self.max_keys:
+            store.popitem(last=False)
+
+    def _lock(self, key: str, now: float) -> None:
+        locks = self._locked_until
+        locks[key] = now + self.lock_seconds
+        locks.move_to_end(key)
+        # Every lock lasts lock_seconds, so the map is in expiry order and
+        # expired locks are all at the front.
+        while True:
+            first, until = next(iter(locks.items()))
+            if until > now:
+                break
+            del locks[first]
+
+    def _tokens(self, key: str, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return float(self.max_attempts)
+        tokens, last = bucket
+        tokens = min(self.max_attempts, tokens + (now - last) * self.max_attempts / self.window_seconds)
+        if tokens >= self.max_attempts and key not in self._locked_until:
+            # Fully refilled and not locked: nothing worth remembering.
+            del self._buckets[key]
+        return tokens
 
     def is_locked(self, key: str) -> bool:
-        self._cleanup(key)
         until = self._locked_until.get(key)
-        return until is not None and until > time.time()
+        if until is None:
+            return False
+        now = time.monotonic()
+        if until > now:
+            return True
+        del self._locked_until[key]
+        self._tokens(key, now)
+        return False
 
     def record_failure(self, key: str) -> None:
-        now = time.time()
-        self._attempts[key].append(now)
-        self._cleanup(key)
-        if len(self._attempts[key]) >= self.max_attempts:
-            self._locked_until[key] = now + self.lock_seconds
+        now = time.monotonic()
+        tokens = self._tokens(key, now) - 1
+        self._remember(self._buckets, key, (tokens, now))
+        if tokens < 1:
+            # max_attempts failures faster than the bucket refills.
+            self._lock(key, now)
 
     def reset(self, key: str) -> None:
-        self._attempts.pop(key, None)
+        self._buckets.pop(key, None)
         self._locked_until.pop(key, None)
@@ -7,28 +7,42 @@ Enforces dashboard access rules by role.
 # WHY:
 # - Limits access to actions based on user role.
 # HOW:
-# - enforce_rbac() checks request path prefixes against role rules.
+# - require_roles() builds a FastAPI dependency that resolves the current
+#   user and checks its role; routes declare it instead of re-checking inline.
 
 # FLOW:
-# - enforce_rbac() checks role against route prefix.
+# - Route dependency -> get_current_user -> role check -> handler.
 
 from __future__ import annotations
 
-from fastapi import HTTPException, status
+from fastapi import Depends, HTTPException, status
 
-ROLE_PATH_RULES = [
-    ("/admin", {"admin"}),
-    ("/employee", {"employee", "admin"}),
-]
+from app.app_context import get_current_user
 
 
-def enforce_rbac(user, path: str) -> None:
-    """Raise 403 if user role does not satisfy path-based access rules."""
-    for prefix, roles in ROLE_PATH_RULES:
-        if path.startswith(prefix):
-            if user.role not in roles:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Access denied",
-                )
-            return
+ADMIN_ROLES = frozenset({"admin"})
+EMPLOYEE_ROLES = frozenset({"employee", "admin"})
+
+
+def _check_role(user, roles: frozenset) -> None:
+    if user.role not in roles:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied",
+        )
+
+
+def require_roles(*roles: str):
+    """Return a dependency yielding the current user if their role is in ``roles``."""
+    allowed = frozenset(roles)
+
+    def dependency(user=Depends(get_current_user)):
+        _check_role(user, allowed)
+        return user
+
+    return dependency
+
+
+require_admin = require_roles(*ADMIN_ROLES)
+require_employee = require_roles(*EMPLOYEE_ROLES)
+
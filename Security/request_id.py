@@ -9,18 +9,38 @@ Attach a unique request id for traceability.
 # WHY:
 # - Helps correlate logs across services.
 # HOW:
-# - Adds a UUID per request and returns it in response headers.
+# - Adds a random 128-bit hex id per request and returns it in response headers.
+# - Plain ASGI middleware; the header is added to http.response.start.
 
 from __future__ import annotations
 
-import uuid
-from starlette.middleware.base import BaseHTTPMiddleware
+import secrets
 
 
-class RequestIdMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        request_id = request.headers.get("x-request-id") or str(uuid.uuid4())
-        request.state.request_id = request_id
-        response = await call_next(request)
-        response.headers["x-request-id"] = request_id
-        return response
+class RequestIdMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        request_id = request_id or secrets.token_hex(16)
+        # request.state reads from scope["state"].
+        scope.setdefault("state", {})["request_id"] = request_id
+        header = (b"x-request-id", request_id.encode("latin-1"))
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = [h for h in message.get("headers", ()) if h[0].lower() != b"x-request-id"]
+                headers.append(header)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_request_id)
@@ -9,7 +9,8 @@ Utility to mask secrets in logs.
 # WHY:
 # - Prevents leaking credentials in logs.
 # HOW:
-# - Replaces sensitive values with ***.
+# - Replaces sensitive values with *** in a single regex pass (re2 when
+#   available, stdlib re otherwise).
 
 from __future__ import annotations
 
@@ -18,16 +19,29 @@ import re
 from Security.security_config import feature_enabled
 
 
-_SECRET_PATTERNS = [
-    re.compile(r"(password=)([^&\s]+)", re.IGNORECASE),
-    re.compile(r"(token=)([^&\s]+)", re.IGNORECASE),
-    re.compile(r"(key=)([^&\s]+)", re.IGNORECASE),
-]
+try:
+    import re2 as _re2
+except Exception:  # pragma: no cover
+    _re2 = None
+
+
+# One alternation scans the string once instead of once per secret name.
+# With google-re2 installed the same pattern runs on its linear-time DFA.
+_SECRET_PATTERN = r"(?i)(password=|token=|key=)([^&\s]+)"
+_SECRET_RE = (_re2 or re).compile(_SECRET_PATTERN)
+
+
+_MARKERS = ("password=", "token=", "key=")
 
 
 def redact(value: str) -> str:
+    # Most values carry no secret marker; substring tests (C memmem) are far
+    # cheaper than running the regex or reading the feature flag.
+    if "=" not in value:
+        return value
+    low = value.lower()
+    if not any(marker in low for marker in _MARKERS):
+        return value
     if not feature_enabled("secrets-redaction", True):
         return value
-    for pattern in _SECRET_PATTERNS:
-        value = pattern.sub(r"\1***", value)
-    return value
+    return _SECRET_RE.sub(r"\1***", value)
@@ -9,32 +9,39 @@ Rejects insecure HTTP requests when HTTPS is required.
 # WHY:
 # - Prevents accidental insecure HTTP usage.
 # HOW:
-# - Checks scheme/x-forwarded-proto and blocks HTTP.
+# - Checks scheme/x-forwarded-proto from the ASGI scope and blocks HTTP.
 
 from __future__ import annotations
 
 import os
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
 from starlette.responses import JSONResponse
 from Security.metrics import increment_feature_event
 
 
-class BlockInsecureRequestsMiddleware(BaseHTTPMiddleware):
+_LOOPBACK = frozenset(("127.0.0.1", "::1", "localhost"))
+
+
+class BlockInsecureRequestsMiddleware:
     def __init__(self, app, enabled: bool = True):
-        super().__init__(app)
+        self.app = app
         self.enabled = enabled
         self.allow_insecure_localhost = os.getenv("ALLOW_INSECURE_LOCALHOST", "true").lower() == "true"
 
-    async def dispatch(self, request, call_next):
-        if not self.enabled:
-            return await call_next(request)
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
         if self.allow_insecure_localhost:
-            client_host = request.client.host if request.client else ""
-            if client_host in {"127.0.0.1", "::1", "localhost"}:
-                return await call_next(request)
-        forwarded_proto = request.headers.get("x-forwarded-proto")
-        scheme = forwarded_proto or request.url.scheme
+            client = scope.get("client")
+            client_host = client[0] if client else ""
+            if client_host in _LOOPBACK:
+                await self.app(scope, receive, send)
+                return
+        forwarded_proto = Headers(scope=scope).get("x-forwarded-proto")
+        scheme = forwarded_proto or scope.get("scheme", "http")
         if scheme != "https":
             increment_feature_event("secure-connection")
-            return JSONResponse({"detail": "Insecure connection"}, status_code=400)
-        return await call_next(request)
+            await JSONResponse({"detail": "Insecure connection"}, status_code=400)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
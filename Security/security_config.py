@@ -10,9 +10,12 @@ Centralized security settings loaded from environment.
 # - Centralizes security tuning per environment.
 # HOW:
 # - Reads env vars and stores them in a dict.
+# - Each .env file is parsed once per mtime and shared by ENV_ACTIVE
+#   detection, env loading and ensure_session_secret().
 
 from __future__ import annotations
 
+import functools
 import os
 import secrets
 import logging
@@ -37,11 +40,34 @@ def get_list(name: str, default: list[str]) -> list[str]:
     return [item.strip() for item in raw.split(",") if item.strip()]
 
 
+@functools.lru_cache(maxsize=64)
 def feature_enabled(feature_id: str, default: bool = True) -> bool:
+    # Cached per (feature, default); anything that changes FEATURE_*_ENABLED
+    # at runtime must call feature_enabled.cache_clear().
     key = f"FEATURE_{feature_id.upper().replace('-', '_')}_ENABLED"
     return get_bool(key, default)
 
 
+@functools.lru_cache(maxsize=4)
+def _parse_env_file_at(path: str, mtime: float) -> dict[str, str]:
+    return {k: v for k, v in dotenv.dotenv_values(path).items() if v is not None}
+
+
+def _parse_env_file(path: str) -> dict[str, str]:
+    """Parsed .env file, re-read only when its mtime changes ({} if missing)."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    return _parse_env_file_at(path, mtime)
+
+
+def _load_env_file(path: str) -> None:
+    # Same as dotenv.load_dotenv(path): existing env vars win.
+    for key, value in _parse_env_file(path).items():
+        os.environ.setdefault(key, value)
+
+
 def _env_name() -> str:
     env = os.getenv("APP_ENV", "").strip().lower()
     if env in {"prod", "production"}:
@@ -60,13 +86,8 @@ def _env_name() -> str:
     local_path = os.path.join(root, ".env.localhost")
 
     def _is_active(path: str) -> bool:
-        if not os.path.exists(path):
-            return False
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip().startswith("ENV_ACTIVE="):
-                    return line.split("=", 1)[1].strip().strip('"').lower() == "true"
-        return False
+        value = _parse_env_file(path).get("ENV_ACTIVE") or ""
+        return value.strip().strip('"').lower() == "true"
 
     if _is_active(prod_typo_path):
         return ".env.productuion"
@@ -80,7 +101,7 @@ def _env_path() -> str:
     return os.path.join(root, _env_name())
 
 
-dotenv.load_dotenv(_env_path())
+_load_env_file(_env_path())
 
 # Optional startup log
 if os.getenv("APP_ENV_LOG", "false").lower() == "true":
@@ -103,7 +124,7 @@ SECURITY_SETTINGS = {
 
 def ensure_session_secret(env_name: str = "SESSION_SECRET_KEY") -> str:
     """Ensure a strong session secret exists in .env and environment."""
-    dotenv.load_dotenv(_env_path())
+    _load_env_file(_env_path())
     primary = os.getenv("SECRET_KEY") or os.getenv(env_name)
     placeholders = {"", "change-this-secret", "REPLACE_WITH_SECURE_RANDOM_SECRET", "AUTO_GENERATE"}
     if primary and primary not in placeholders:
@@ -116,10 +137,11 @@ def ensure_session_secret(env_name: str = "SESSION_SECRET_KEY") -> str:
     os.environ["SECRET_KEY"] = secret
 
     env_path = _env_path()
+    current = None
     if os.path.exists(env_path):
         with open(env_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        lines = content.splitlines()
+            current = f.read()
+        lines = current.splitlines()
         def _upsert(lines_list, key, value):
             if any(line.startswith(f"{key}=") for line in lines_list):
                 return [f"{key}=\"{value}\"" if line.startswith(f"{key}=") else line for line in lines_list]
@@ -131,7 +153,12 @@ def ensure_session_secret(env_name: str = "SESSION_SECRET_KEY") -> str:
     else:
         content = f"SECRET_KEY=\"{secret}\"\n{env_name}=\"{secret}\"\n"
 
-    with open(env_path, "w", encoding="utf-8") as f:
-        f.write(content)
+    if content != current:
+        # Write beside the target and swap it in, so a crash mid-write never
+        # leaves a truncated .env behind.
+        tmp = env_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp, env_path)
 
     return secret
@@ -5,28 +5,66 @@ Encrypted, HttpOnly sessions with expiration and regeneration support.
 
 FLOW:
 - Middleware decrypts cookie into request.session.
-- On response, session is encrypted back into cookie.
+- On response start, session is encrypted back into a Set-Cookie header
+  (plain ASGI send wrapper, no BaseHTTPMiddleware task/buffering).
 - Helpers manage login/logout and timing.
 
 WHY:
 - Protects session data from client-side tampering.
 
 HOW:
-- Encrypts session payload with Fernet and sets HttpOnly/Secure flags.
+- Encrypts session payload with AES-256-GCM (single pass, AES-NI/CLMUL in
+  OpenSSL) and sets HttpOnly/Secure flags.
+- Payloads are serialised with orjson when installed, json otherwise.
+- Cookies issued before the switch are still read with Fernet once and
+  re-issued as AES-GCM.
 """
 
 from __future__ import annotations
 
 import base64
+import functools
 import hashlib
+import http.cookies
 import json
 import secrets
 import time
 from typing import Any, Dict
 import os
 
+from cryptography.exceptions import InvalidTag
 from cryptography.fernet import Fernet, InvalidToken
-from starlette.middleware.base import BaseHTTPMiddleware
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from starlette.requests import HTTPConnection
+
+try:
+    import orjson as _orjson
+except Exception:  # pragma: no cover
+    _orjson = None
+
+
+if _orjson is not None:
+    def _dumps(obj: Any) -> bytes:
+        # Non-str keys are stringified, as json.dumps() does.
+        return _orjson.dumps(obj, option=_orjson.OPT_NON_STR_KEYS)
+
+    _loads = _orjson.loads
+else:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    _loads = json.loads
+
+
+_LOOPBACK = frozenset(("127.0.0.1", "::1", "localhost"))
+
+
+_NONCE_SIZE = 12
+
+
+def _derive_session_key(secret: str) -> bytes:
+    # Domain-separated from the legacy Fernet key below.
+    return hashlib.sha256(b"session-aesgcm:" + secret.encode("utf-8")).digest()
 
 
 def _derive_fernet_key(secret: str) -> bytes:
@@ -34,16 +72,61 @@ def _derive_fernet_key(secret: str) -> bytes:
     return base64.urlsafe_b64encode(digest)
 
 
+@functools.lru_cache(maxsize=1)
+def _fingerprint_key() -> bytes:
+    # Read on first use: secrets are loaded into the env after import.
+    secret = os.getenv("SESSION_SECRET_KEY") or os.getenv("SECRET_KEY") or ""
+    return hashlib.sha256(secret.encode("utf-8")).digest()
+
+
 def _fingerprint(user_agent: str | None, ip: str | None) -> str:
+    # Keyed BLAKE2b: faster than SHA-256 in software, and a 16-byte digest
+    # halves what the cookie carries.
+    raw = f"{user_agent or ''}|{ip or ''}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16, key=_fingerprint_key()).hexdigest()
+
+
+def _legacy_fingerprint(user_agent: str | None, ip: str | None) -> str:
     raw = f"{user_agent or ''}|{ip or ''}"
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
-class EncryptedSessionMiddleware(BaseHTTPMiddleware):
+def _cookie_header(
+    key: str,
+    value: str,
+    max_age: int | None,
+    path: str,
+    domain: str | None,
+    secure: bool,
+    httponly: bool,
+    samesite: str | None,
+    expires: int | None = None,
+) -> str:
+    # Same serialisation as starlette's Response.set_cookie().
+    cookie: http.cookies.BaseCookie[str] = http.cookies.SimpleCookie()
+    cookie[key] = value
+    if max_age is not None:
+        cookie[key]["max-age"] = max_age
+    if expires is not None:
+        cookie[key]["expires"] = expires
+    if path is not None:
+        cookie[key]["path"] = path
+    if domain is not None:
+        cookie[key]["domain"] = domain
+    if secure:
+        cookie[key]["secure"] = True
+    if httponly:
+        cookie[key]["httponly"] = True
+    if samesite is not None:
+        cookie[key]["samesite"] = samesite
+    return cookie.output(header="").strip()
+
+
+class EncryptedSessionMiddleware:
     """
     Encrypted session cookie middleware.
 
-    - Encrypts session data with Fernet (AES in CBC + HMAC)
+    - Encrypts session data with AES-256-GCM (legacy Fernet cookies still read)
     - Sets HttpOnly and Secure flags
     - Supports absolute and idle session expiration
     - Optional session fingerprint validation
@@ -62,7 +145,7 @@ class EncryptedSessionMiddleware(BaseHTTPMiddleware):
         path: str = "/",
         enforce_fingerprint: bool = True,
     ):
-        super().__init__(app)
+        self.app = app
         self.cookie_name = cookie_name
         self.max_age_seconds = max_age_seconds
         self.idle_timeout_seconds = idle_timeout_seconds
@@ -72,20 +155,48 @@ class EncryptedSessionMiddleware(BaseHTTPMiddleware):
         self.path = path
         self.enforce_fingerprint = enforce_fingerprint
         self.allow_insecure_localhost = os.getenv("ALLOW_INSECURE_LOCALHOST", "true").lower() == "true"
-        self.fernet = Fernet(_derive_fernet_key(secret_key))
-
-    async def dispatch(self, request, call_next):
+        self.aead = AESGCM(_derive_session_key(secret_key))
+        self.legacy_fernet = Fernet(_derive_fernet_key(secret_key))
+        # Cookie attributes never change per request: the Set-Cookie value
+        # is prefix + token + one of two prebuilt suffixes, and the clearing
+        # header is fully constant.
+        attrs = f"; HttpOnly; Max-Age={self.max_age_seconds}; Path={self.path}"
+        if self.domain is not None:
+            attrs += f"; Domain={self.domain}"
+        attrs += f"; SameSite={self.same_site}"
+        self._cookie_prefix = f"{self.cookie_name}=".encode("latin-1")
+        self._cookie_suffix = attrs.encode("latin-1")
+        self._cookie_suffix_secure = (attrs + "; Secure").encode("latin-1")
+        self._delete_cookie = _cookie_header(
+            self.cookie_name, "", 0, self.path, self.domain,
+            secure=False, httponly=False, samesite="lax", expires=0,
+        ).encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
         now = int(time.time())
+        client = scope.get("client")
+        client_host = client[0] if client else None
+        # One fingerprint per request, shared by validation and re-issue.
+        fingerprint = (
+            _fingerprint(connection.headers.get("user-agent"), client_host)
+            if self.enforce_fingerprint
+            else None
+        )
         session: Dict[str, Any] = {}
         created = now
         last_seen = now
         expired = False
 
-        cookie = request.cookies.get(self.cookie_name)
+        cookie = connection.cookies.get(self.cookie_name)
         if cookie:
             try:
-                payload = self.fernet.decrypt(cookie.encode("utf-8"))
-                data = json.loads(payload.decode("utf-8"))
+                payload = self._decrypt(cookie)
+                data = _loads(payload)
                 session = data.get("data", {})
                 created = int(data.get("iat", now))
                 last_seen = int(data.get("last", now))
@@ -98,36 +209,62 @@ class EncryptedSessionMiddleware(BaseHTTPMiddleware):
 
                 if self.enforce_fingerprint and session:
                     expected = session.get("_fp")
-                    current = _fingerprint(
-                        request.headers.get("user-agent"),
-                        request.client.host if request.client else None,
-                    )
-                    if expected and expected != current:
-                        expired = True
-            except (InvalidToken, ValueError, TypeError):
+                    if expected and expected != fingerprint:
+                        # Sessions stamped before the BLAKE2b switch carry a
+                        # 64-char SHA-256 value; accept and upgrade it.
+                        if len(expected) == 64 and expected == _legacy_fingerprint(
+                            connection.headers.get("user-agent"), client_host
+                        ):
+                            session["_fp"] = fingerprint
+                        else:
+                            expired = True
+            except (InvalidTag, InvalidToken, ValueError, TypeError):
                 expired = True
 
         if expired:
             session = {}
 
-        request.scope["session"] = session
+        scope["session"] = session
 
-        response = await call_next(request)
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start":
+                cookie = self._session_cookie(scope.get("session", {}), created, now, fingerprint, client_host)
+                message["headers"] = [*message.get("headers", ()), (b"set-cookie", cookie)]
+            await send(message)
 
-        session = request.scope.get("session", {})
+        await self.app(scope, receive, send_with_cookie)
+
+    def _decrypt(self, cookie: str) -> bytes:
+        raw = base64.urlsafe_b64decode(cookie + "=" * (-len(cookie) % 4))
+        # Fernet tokens start with version byte 0x80; AES-GCM cookies are a
+        # random nonce, so this only misroutes 1 in 256 of them, which then
+        # fail Fernet and are retried as AES-GCM.
+        if raw[:1] == b"\x80":
+            try:
+                return self.legacy_fernet.decrypt(cookie.encode("utf-8"))
+            except InvalidToken:
+                pass
+        if len(raw) <= _NONCE_SIZE:
+            raise ValueError("session cookie too short")
+        return self.aead.decrypt(raw[:_NONCE_SIZE], raw[_NONCE_SIZE:], None)
+
+    def _session_cookie(
+        self,
+        session: Dict[str, Any],
+        created: int,
+        now: int,
+        fingerprint: str | None,
+        client_host: str | None,
+    ) -> bytes:
         if not session:
-            response.delete_cookie(self.cookie_name, path=self.path, domain=self.domain)
-            return response
+            return self._delete_cookie
 
         created = int(session.get("_created", created))
         session.setdefault("_created", created)
         session.setdefault("_sid", secrets.token_urlsafe(32))
         session["_last_seen"] = now
         if self.enforce_fingerprint and "_fp" not in session:
-            session["_fp"] = _fingerprint(
-                request.headers.get("user-agent"),
-                request.client.host if request.client else None,
-            )
+            session["_fp"] = fingerprint
 
         exp = created + self.max_age_seconds if self.max_age_seconds else None
         data = {
@@ -136,25 +273,16 @@ class EncryptedSessionMiddleware(BaseHTTPMiddleware):
             "last": now,
             "exp": exp,
         }
-        token = self.fernet.encrypt(json.dumps(data).encode("utf-8")).decode("utf-8")
+        nonce = os.urandom(_NONCE_SIZE)
+        sealed = self.aead.encrypt(nonce, _dumps(data), None)
+        # Unpadded, so the value is a plain cookie token that never needs quoting.
+        token = base64.urlsafe_b64encode(nonce + sealed).rstrip(b"=")
 
         secure_flag = self.https_only
-        if self.allow_insecure_localhost:
-            client_host = request.client.host if request.client else ""
-            if client_host in {"127.0.0.1", "::1", "localhost"}:
-                secure_flag = False
-
-        response.set_cookie(
-            self.cookie_name,
-            token,
-            max_age=self.max_age_seconds,
-            httponly=True,
-            secure=secure_flag,
-            samesite=self.same_site,
-            domain=self.domain,
-            path=self.path,
-        )
-        return response
+        if self.allow_insecure_localhost and client_host in _LOOPBACK:
+            secure_flag = False
+
+        return self._cookie_prefix + token + (self._cookie_suffix_secure if secure_flag else self._cookie_suffix)
 
 
 def initialize_session(request, user_id: int) -> None:
@@ -9,32 +9,46 @@ Security headers and CSP for mitigating cross-site scripting.
 # WHY:
 # - Mitigates script injection and clickjacking.
 # HOW:
-# - Applies CSP and restrictive headers on every response.
+# - Applies CSP and restrictive headers on every response, in a plain ASGI
+#   send wrapper.
 
 from __future__ import annotations
 
-from starlette.middleware.base import BaseHTTPMiddleware
+# Development CSP - permissive to allow all styling and scripts
+_CSP = (
+    "default-src 'self' https:; "
+    "script-src 'self' 'unsafe-inline' 'unsafe-eval' https:; "
+    "style-src 'self' 'unsafe-inline' https:; "
+    "img-src 'self' data: https:; "
+    "font-src 'self' data: https:; "
+    "connect-src 'self' https:; "
+    "frame-ancestors 'self'"
+)
 
+# Encoded once; added to each response's raw headers unless already set.
+_STATIC_HEADERS: tuple[tuple[bytes, bytes], ...] = (
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"SAMEORIGIN"),
+    (b"referrer-policy", b"no-referrer-when-downgrade"),
+    (b"content-security-policy", _CSP.encode("latin-1")),
+)
 
-class XSSProtectionMiddleware(BaseHTTPMiddleware):
+
+class XSSProtectionMiddleware:
     def __init__(self, app):
-        super().__init__(app)
-
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-        response.headers.setdefault("X-Content-Type-Options", "nosniff")
-        response.headers.setdefault("X-Frame-Options", "SAMEORIGIN")
-        response.headers.setdefault("Referrer-Policy", "no-referrer-when-downgrade")
-        
-        # Development CSP - permissive to allow all styling and scripts
-        csp = (
-            "default-src 'self' https:; "
-            "script-src 'self' 'unsafe-inline' 'unsafe-eval' https:; "
-            "style-src 'self' 'unsafe-inline' https:; "
-            "img-src 'self' data: https:; "
-            "font-src 'self' data: https:; "
-            "connect-src 'self' https:; "
-            "frame-ancestors 'self'"
-        )
-        response.headers.setdefault("Content-Security-Policy", csp)
-        return response
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                existing = {name.lower() for name, _ in headers}
+                headers.extend(h for h in _STATIC_HEADERS if h[0] not in existing)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -1,7 +1,8 @@
 from fastapi import Depends, HTTPException, Request, Form, File, UploadFile
 from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import case, extract, func, or_, select, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, defer, undefer
 from typing import Optional
 import datetime
 import random
@@ -35,14 +36,30 @@ from .models import (
     EmailSettings, InappropriateEntry
 )
 from .auth import hash_password
-from .email_service import send_welcome_email, send_leave_status_email
+from .email_service import (
+    get_email_settings,
+    invalidate_email_settings,
+    send_leave_status_email,
+    send_welcome_email,
+)
 from .app_context import templates, get_current_user, create_notification
 from .payroll_utils import calculate_monthly_payroll
 from Security.data_integrity import sha256_hex
 from Security.hash_history import log_hash_history
+from Security.rbac import require_admin, require_roles
+from Security.security_config import SECURITY_SETTINGS
 from .security_bootstrap import encrypt_value
 
 
+# Admin pages never render photo bytes (they link to /employee/photo/...), so
+# keep the BLOB out of every User row they load.
+_WITHOUT_PHOTO = defer(User.photo_blob)
+# For pages that show a photo link: skip the BLOB, load the has_photo flag.
+_PHOTO_FLAG = (_WITHOUT_PHOTO, undefer(User.has_photo))
+_MAX_PHOTO_BYTES = SECURITY_SETTINGS["MAX_BODY_BYTES"]
+_EMPLOYEE_ID_ATTEMPTS = 5
+
+
 def _hash_optional(value: str | None) -> str | None:
     if value is None:
         return None
@@ -80,6 +97,89 @@ def _sync_user_hashes(emp: User, actor: User | None = None, details: str = "upda
         )
 
 
+def _taken_user_fields(db: Session, exclude_id: int | None = None, **values) -> set[str]:
+    """Return which of ``values`` (User column -> value) another user already has.
+
+    One round trip: each column is compared in SQL and tagged by name, so the
+    database's own collation decides what counts as a duplicate.
+    """
+    values = {field: value for field, value in values.items() if value is not None}
+    if not values:
+        return set()
+    matches = [(getattr(User, field) == value) for field, value in values.items()]
+    query = db.query(*(match.label(field) for field, match in zip(values, matches))).filter(or_(*matches))
+    if exclude_id is not None:
+        query = query.filter(User.id != exclude_id)
+    taken: set[str] = set()
+    for row in query.all():
+        taken.update(field for field, hit in zip(values, row) if hit)
+    return taken
+
+
+def _total_attendance_hours(db: Session, employee_id: str) -> float:
+    # Summed in SQL so one scalar comes back however long the history is.
+    return db.query(func.coalesce(func.sum(Attendance.duration), 0)).filter(
+        Attendance.employee_id == employee_id
+    ).scalar()
+
+
+def _department_and_team_options(db: Session) -> tuple[list[Department], list[Team]]:
+    """Departments and name-ordered teams for the employee form dropdowns.
+
+    The templates only read plain columns, so no relationships are loaded.
+    """
+    departments = db.scalars(select(Department)).all()
+    teams = db.scalars(select(Team).order_by(Team.name.asc())).all()
+    return departments, teams
+
+
+def _read_photo(photo: Optional[UploadFile]) -> tuple[bytes | None, str | None]:
+    """Read an uploaded photo for the photo_blob column, capped at MAX_BODY_BYTES.
+
+    Starlette has already spooled the upload to a temp file; reading at most one
+    byte past the cap keeps an oversized file from being pulled into memory.
+    """
+    if not photo or not photo.filename:
+        return None, None
+    data = photo.file.read(_MAX_PHOTO_BYTES + 1)
+    if len(data) > _MAX_PHOTO_BYTES:
+        raise HTTPException(status_code=413, detail="Photo is too large")
+    return data or None, photo.content_type or "image/jpeg"
+
+
+def _next_employee_id(db: Session, prefix: str) -> str:
+    # Longest id first so "22601000" sorts above "2260999".
+    max_emp = db.query(User.employee_id).filter(User.employee_id.like(f"{prefix}%")).order_by(
+        func.length(User.employee_id).desc(), User.employee_id.desc()
+    ).first()
+    next_id = 1
+    if max_emp and len(max_emp.employee_id) > len(prefix):
+        try:
+            next_id = int(max_emp.employee_id[len(prefix):]) + 1
+        except ValueError:
+            next_id = 1
+    return f"{prefix}{next_id:03d}"
+
+
+def _insert_with_next_employee_id(db: Session, emp: User, prefix: str) -> str:
+    """Assign the next free ``prefix`` id to ``emp`` and flush its INSERT.
+
+    Two concurrent hires can read the same max id; the loser's INSERT hits the
+    unique index, is rolled back to a savepoint and retried with a fresh id.
+    """
+    for attempt in range(_EMPLOYEE_ID_ATTEMPTS):
+        emp.employee_id = _next_employee_id(db, prefix)
+        try:
+            with db.begin_nested():
+                db.add(emp)
+        except IntegrityError:
+            id_taken = db.query(User.id).filter(User.employee_id == emp.employee_id).first() is not None
+            if not id_taken or attempt == _EMPLOYEE_ID_ATTEMPTS - 1:
+                raise
+        else:
+            return emp.employee_id
+
+
 def _sync_user_secure_fields(emp: User) -> None:
     # Keep encrypted mirrors in sync so values can be safely revealed where required.
     emp.name_secure = encrypt_value(emp.name)
@@ -91,10 +191,8 @@ def _sync_user_secure_fields(emp: User) -> None:
 
 def register_admin_routes(app):
     @app.post("/admin/update_department")
-    async def update_department(request: Request, id: int = Form(...), name: str = Form(...), description: str = Form(None), prefix: str = Form(None),
-                               user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
+    def update_department(request: Request, id: int = Form(...), name: str = Form(...), description: str = Form(None), prefix: str = Form(None),
+                         user: User = Depends(require_admin), db: Session = Depends(get_db)):
         dept = db.query(Department).filter(Department.id == id).first()
         if not dept:
             raise HTTPException(status_code=404, detail="Department not found")
@@ -104,21 +202,15 @@ def register_admin_routes(app):
         db.commit()
         return RedirectResponse(url="/admin/settings", status_code=303)
     @app.get("/admin/select_dashboard", response_class=HTMLResponse)
-    async def admin_choice(request: Request, user: User = Depends(get_current_user)):
+    def admin_choice(request: Request, user: User = Depends(get_current_user)):
         return templates.TemplateResponse("admin/admin_select_dashboard.html", {"request": request, "user": user})
 
     @app.get("/admin", response_class=HTMLResponse)
-    async def admin_dashboard(
+    def admin_dashboard(
         request: Request,
-        user: User = Depends(get_current_user),
+        user: User = Depends(require_admin),
         db: Session = Depends(get_db)
     ):
-        # --------------------------------------------------
-        # AUTH
-        # --------------------------------------------------
-        if user.role != "admin":
-            raise HTTPException(status_code=403)
-
         today = dt.date.today()
         start_of_day = dt.datetime.combine(today, dt.time.min)
 
@@ -214,7 +306,7 @@ def register_admin_routes(app):
             .all()
         )
 
-        admins = db.query(User).filter(User.role == "admin").all()
+        admins = db.query(User).options(_WITHOUT_PHOTO).filter(User.role == "admin").all()
 
         removed_employees = (
             db.query(RemovedEmployee)
@@ -300,11 +392,8 @@ def register_admin_routes(app):
         )
 
     @app.get("/admin/register_employee", response_class=HTMLResponse)
-    async def admin_register_employee(request: Request, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
-        departments = db.query(Department).all()
-        teams = db.query(Team).order_by(Team.name.asc()).all()
+    def admin_register_employee(request: Request, user: User = Depends(require_admin), db: Session = Depends(get_db)):
+        departments, teams = _department_and_team_options(db)
         return templates.TemplateResponse("admin/admin_register_employee.html", {
             "request": request,
             "user": user,
@@ -313,7 +402,7 @@ def register_admin_routes(app):
         })
 
     @app.post("/admin/add_employee")
-    async def add_employee(
+    def add_employee(
         request: Request,
         name: str = Form(...),
         email: str = Form(...),
@@ -332,33 +421,19 @@ def register_admin_routes(app):
         can_manage: Optional[str] = Form(None),
         active_leader: Optional[str] = Form(None),
         photo: Optional[UploadFile] = File(None),
-        user: User = Depends(get_current_user),
+        user: User = Depends(require_admin),
         db: Session = Depends(get_db),
     ):
-        existing_name = db.query(User).filter(User.name == name).first()
-        if existing_name:
+        taken = _taken_user_fields(db, name=name, email=email, rfid_tag=rfid_tag)
+        if "name" in taken:
             raise HTTPException(status_code=400, detail=f"Name '{name}' already exists in the system")
-
-        existing_email = db.query(User).filter(User.email == email).first()
-        if existing_email:
+        if "email" in taken:
             raise HTTPException(status_code=400, detail=f"Email '{email}' already exists in the system")
-
-        existing_rfid = db.query(User).filter(User.rfid_tag == rfid_tag).first()
-        if existing_rfid:
+        if "rfid_tag" in taken:
             raise HTTPException(status_code=400, detail=f"RFID tag '{rfid_tag}' is already assigned to another employee")
 
         dept_obj = db.query(Department).filter(Department.name == department).first()
         prefix = dept_obj.prefix if dept_obj and dept_obj.prefix else "2260"
-        max_emp = db.query(User).filter(User.employee_id.like(f"{prefix}%")).order_by(User.employee_id.desc()).first()
-        if max_emp and len(max_emp.employee_id) > len(prefix):
-            try:
-                suffix = int(max_emp.employee_id[len(prefix):])
-                next_id = suffix + 1
-            except ValueError:
-                next_id = 1
-        else:
-            next_id = 1
-        employee_id = f"{prefix}{next_id:03d}"
         password = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
         password_hash = hash_password(password)
         dob_val = None
@@ -372,20 +447,15 @@ def register_admin_routes(app):
                 except Exception:
                     dob_val = None
 
-        photo_blob = None
-        photo_mime = None
-        if photo and photo.filename:
-            photo_blob = await photo.read()
-            photo_mime = photo.content_type or "image/jpeg"
+        photo_blob, photo_mime = _read_photo(photo)
 
         team_id_val = int(team_id) if team_id else None
         if team_id_val:
-            team_exists = db.query(Team).filter(Team.id == team_id_val).first()
+            team_exists = db.query(Team.id).filter(Team.id == team_id_val).first() is not None
             if not team_exists:
                 team_id_val = None
 
         new_user = User(
-            employee_id=employee_id,
             name=name,
             email=email,
             phone=phone,
@@ -415,16 +485,14 @@ def register_admin_routes(app):
         new_user.can_manage = True if can_manage else False
         new_user.active_leader = True if active_leader else False
         _sync_user_secure_fields(new_user)
+        employee_id = _insert_with_next_employee_id(db, new_user, prefix)
         _sync_user_hashes(new_user, actor=user, details="create")
-        db.add(new_user)
         db.commit()
         email_sent = send_welcome_email(email, name, employee_id, password)
         return {"employee_id": employee_id, "password": password, "email_sent": email_sent}
 
     @app.get("/admin/settings", response_class=HTMLResponse)
-    async def admin_settings_page(request: Request, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
+    def admin_settings_page(request: Request, user: User = Depends(require_admin), db: Session = Depends(get_db)):
 
         rooms = db.query(Room).all()
         departments = db.query(Department).all()
@@ -437,33 +505,29 @@ def register_admin_routes(app):
         })
 
     @app.get("/admin/email_settings", response_class=HTMLResponse)
-    async def admin_email_settings_page(request: Request, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
+    def admin_email_settings_page(request: Request, user: User = Depends(require_admin), db: Session = Depends(get_db)):
 
-        settings = db.query(EmailSettings).order_by(EmailSettings.id.desc()).first()
+        settings = get_email_settings()
         return templates.TemplateResponse("admin/admin_email_settings.html", {
             "request": request,
             "user": user,
-            "smtp_user": settings.smtp_user if settings else "",
-            "smtp_from": settings.smtp_from if settings else "",
-            "smtp_host": settings.smtp_host if settings and settings.smtp_host else "smtp.gmail.com",
-            "smtp_port": settings.smtp_port if settings and settings.smtp_port else "465"
+            "smtp_user": settings["smtp_user"] if settings else "",
+            "smtp_from": settings["smtp_from"] if settings else "",
+            "smtp_host": settings["smtp_host"] if settings and settings["smtp_host"] else "smtp.gmail.com",
+            "smtp_port": settings["smtp_port"] if settings and settings["smtp_port"] else "465"
         })
 
     @app.post("/admin/email_settings")
-    async def admin_email_settings_save(
+    def admin_email_settings_save(
         request: Request,
         smtp_user: str = Form(""),
         smtp_from: str = Form(""),
         smtp_pass: str = Form(""),
         smtp_host: str = Form("smtp.gmail.com"),
         smtp_port: str = Form("465"),
-        user: User = Depends(get_current_user),
+        user: User = Depends(require_admin),
         db: Session = Depends(get_db)
     ):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
 
         settings = db.query(EmailSettings).order_by(EmailSettings.id.desc()).first()
         if not settings:
@@ -477,23 +541,27 @@ def register_admin_routes(app):
         if smtp_pass.strip():
             settings.smtp_pass = smtp_pass.strip()
         db.commit()
+        invalidate_email_settings()
 
         return RedirectResponse("/admin/email_settings", status_code=303)
 
     @app.post("/admin/remove_employee")
-    async def remove_employee(request: Request, employee_id: str = Form(...), user: User = Depends(get_current_user),
-                              db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
-        emp = db.query(User).filter(User.employee_id == employee_id).first()
+    def remove_employee(request: Request, employee_id: str = Form(...), user: User = Depends(require_admin),
+                        db: Session = Depends(get_db)):
+        emp = db.query(User).options(_WITHOUT_PHOTO).filter(User.employee_id == employee_id).first()
         if not emp:
             raise HTTPException(status_code=404, detail="Employee not found")
         # Remove all project meeting assignees for this employee to avoid FK constraint
         db.query(ProjectMeetingAssignee).filter(ProjectMeetingAssignee.employee_id == emp.employee_id).delete(synchronize_session=False)
         db.query(TeamMember).filter(TeamMember.user_id == emp.id).delete(synchronize_session=False)
-        db.query(Team).filter(Team.leader_id == emp.id).update({Team.leader_id: None}, synchronize_session=False)
-        db.query(Team).filter(Team.permanent_leader_id == emp.id).update(
-            {Team.permanent_leader_id: None},
+        # Clear both leader columns in one UPDATE; CASE keeps the other one.
+        db.query(Team).filter(or_(Team.leader_id == emp.id, Team.permanent_leader_id == emp.id)).update(
+            {
+                Team.leader_id: case((Team.leader_id == emp.id, None), else_=Team.leader_id),
+                Team.permanent_leader_id: case(
+                    (Team.permanent_leader_id == emp.id, None), else_=Team.permanent_leader_id
+                ),
+            },
             synchronize_session=False,
         )
         removed = RemovedEmployee(employee_id=emp.employee_id, name=emp.name, email=emp.email, rfid_tag=emp.rfid_tag,
@@ -504,16 +572,13 @@ def register_admin_routes(app):
         return RedirectResponse("/admin/manage_employees?removed=1", status_code=303)
 
     @app.post("/admin/set_base_salary")
-    async def set_base_salary(
+    def set_base_salary(
         employee_id: str = Form(...),
         base_salary: float = Form(...),
-        user: User = Depends(get_current_user),
+        user: User = Depends(require_admin),
         db: Session = Depends(get_db)
     ):
-        if user.role != "admin":
-            raise HTTPException(status_code=403)
-
-        emp = db.query(User).filter(User.employee_id == employee_id).first()
+        emp = db.query(User).options(_WITHOUT_PHOTO).filter(User.employee_id == employee_id).first()
         if not emp:
             raise HTTPException(status_code=404, detail="Employee not found")
 
@@ -523,15 +588,13 @@ def register_admin_routes(app):
         return RedirectResponse("/admin/manage_employees", status_code=303)
 
     @app.get("/admin/manage_employees", response_class=HTMLResponse)
-    async def admin_manage_employees(request: Request,
-                                     search: Optional[str] = None,
-                                     department: Optional[str] = None,
-                                     page: int = 1,
-                                     user: User = Depends(get_current_user),
-                                     db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
-        query = db.query(User).filter(User.is_active == True)
+    def admin_manage_employees(request: Request,
+                               search: Optional[str] = None,
+                               department: Optional[str] = None,
+                               page: int = 1,
+                               user: User = Depends(require_admin),
+                               db: Session = Depends(get_db)):
+        query = db.query(User).options(*_PHOTO_FLAG).filter(User.is_active == True)
         if search:
             query = query.filter(
                 (User.employee_id.like(f"%{search}%")) |
@@ -561,47 +624,45 @@ def register_admin_routes(app):
             })
 
     @app.post("/admin/update_employee")
-    async def admin_update_employee(request: Request,
-                                     employee_id: str = Form(...),
-                                     name: Optional[str] = Form(None),
-                                     email: Optional[str] = Form(None),
-                                     rfid_tag: Optional[str] = Form(None),
-                                     title: Optional[str] = Form(None),
-                                     date_of_birth: Optional[str] = Form(None),
-                                     department: Optional[str] = Form(None),
-                                     role: Optional[str] = Form(None),
-                                     hourly_rate: Optional[float] = Form(None),
-                                     allowances: Optional[float] = Form(None),
-                                     deductions: Optional[float] = Form(None),
-                                     notes: Optional[str] = Form(None),
-                                     team_id: Optional[int] = Form(None),
-                                     is_active: Optional[str] = Form(None),
-                                     can_manage: Optional[str] = Form(None),
-                                     active_leader: Optional[str] = Form(None),
-                                     photo: Optional[UploadFile] = File(None),
-                                     base_salary: Optional[float] = Form(None),
-                                     paid_leaves_allowed: Optional[int] = Form(None),
-                                     tax_percentage: Optional[float] = Form(None),
-                                     user: User = Depends(get_current_user),
-                                     db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
-
-        emp = db.query(User).filter(User.employee_id == employee_id).first()
+    def admin_update_employee(request: Request,
+                               employee_id: str = Form(...),
+                               name: Optional[str] = Form(None),
+                               email: Optional[str] = Form(None),
+                               rfid_tag: Optional[str] = Form(None),
+                               title: Optional[str] = Form(None),
+                               date_of_birth: Optional[str] = Form(None),
+                               department: Optional[str] = Form(None),
+                               role: Optional[str] = Form(None),
+                               hourly_rate: Optional[float] = Form(None),
+                               allowances: Optional[float] = Form(None),
+                               deductions: Optional[float] = Form(None),
+                               notes: Optional[str] = Form(None),
+                               team_id: Optional[int] = Form(None),
+                               is_active: Optional[str] = Form(None),
+                               can_manage: Optional[str] = Form(None),
+                               active_leader: Optional[str] = Form(None),
+                               photo: Optional[UploadFile] = File(None),
+                               base_salary: Optional[float] = Form(None),
+                               paid_leaves_allowed: Optional[int] = Form(None),
+                               tax_percentage: Optional[float] = Form(None),
+                               user: User = Depends(require_admin),
+                               db: Session = Depends(get_db)):
+
+        emp = db.query(User).options(_WITHOUT_PHOTO).filter(User.employee_id == employee_id).first()
         if not emp:
             raise HTTPException(status_code=404, detail="Employee not found")
 
+        taken = _taken_user_fields(db, exclude_id=emp.id, email=email, rfid_tag=rfid_tag)
+        if "email" in taken:
+            raise HTTPException(status_code=400, detail="Email already in use")
+        if "rfid_tag" in taken:
+            raise HTTPException(status_code=400, detail="RFID tag already in use")
+
         if name is not None:
             emp.name = name
         if email is not None:
-            existing_email = db.query(User).filter(User.email == email, User.id != emp.id).first()
-            if existing_email:
-                raise HTTPException(status_code=400, detail="Email already in use")
             emp.email = email
         if rfid_tag is not None:
-            existing_rfid = db.query(User).filter(User.rfid_tag == rfid_tag, User.id != emp.id).first()
-            if existing_rfid:
-                raise HTTPException(status_code=400, detail="RFID tag already in use")
             emp.rfid_tag = rfid_tag
         if title is not None:
             emp.title = title
@@ -623,7 +684,7 @@ def register_admin_routes(app):
         if team_id is not None:
             team_id_val = int(team_id) if str(team_id).isdigit() else None
             if team_id_val:
-                team_exists = db.query(Team).filter(Team.id == team_id_val).first()
+                team_exists = db.query(Team.id).filter(Team.id == team_id_val).first() is not None
                 emp.current_team_id = team_id_val if team_exists else None
             else:
                 emp.current_team_id = None
@@ -631,11 +692,10 @@ def register_admin_routes(app):
         emp.can_manage = True if can_manage else False
         emp.active_leader = True if active_leader else False
 
-        if photo and photo.filename:
-            photo_blob = await photo.read()
-            if photo_blob:
-                emp.photo_blob = photo_blob
-                emp.photo_mime = photo.content_type or "image/jpeg"
+        photo_blob, photo_mime = _read_photo(photo)
+        if photo_blob:
+            emp.photo_blob = photo_blob
+            emp.photo_mime = photo_mime
 
         try:
             if base_salary is not None:
@@ -679,15 +739,12 @@ def register_admin_routes(app):
         return RedirectResponse(url="/admin/manage_employees", status_code=303)
 
     @app.get("/admin/edit_employee", response_class=HTMLResponse)
-    async def admin_edit_employee(request: Request, employee_id: str,
-                                  user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
-        emp = db.query(User).filter(User.employee_id == employee_id).first()
+    def admin_edit_employee(request: Request, employee_id: str,
+                            user: User = Depends(require_admin), db: Session = Depends(get_db)):
+        emp = db.query(User).options(_WITHOUT_PHOTO).filter(User.employee_id == employee_id).first()
         if not emp:
             raise HTTPException(status_code=404, detail="Employee not found")
-        departments = db.query(Department).all()
-        teams = db.query(Team).order_by(Team.name.asc()).all()
+        departments, teams = _department_and_team_options(db)
         return templates.TemplateResponse("admin/admin_edit_employee.html", {
             "request": request,
             "user": user,
@@ -697,11 +754,9 @@ def register_admin_routes(app):
         })
 
     @app.get("/admin/employee_details", response_class=HTMLResponse)
-    async def employee_details(request: Request, employee_id: Optional[str] = None, name: Optional[str] = None,
-                               user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
-        query = db.query(User).filter(User.is_active == True)
+    def employee_details(request: Request, employee_id: Optional[str] = None, name: Optional[str] = None,
+                         user: User = Depends(require_admin), db: Session = Depends(get_db)):
+        query = db.query(User).options(*_PHOTO_FLAG).filter(User.is_active == True)
         if employee_id:
             query = query.filter(User.employee_id == employee_id)
         if name:
@@ -713,9 +768,7 @@ def register_admin_routes(app):
                 "user": user,
                 "error": "Employee not found"
             })
-        total_time = db.query(Attendance).filter(Attendance.employee_id == emp.employee_id).with_entities(
-            Attendance.duration).all()
-        total_hours = sum(d[0] for d in total_time if d[0])
+        total_hours = _total_attendance_hours(db, emp.employee_id)
         latest_payroll = db.query(Payroll).filter(
             Payroll.employee_id == emp.employee_id
         ).order_by(Payroll.year.desc(), Payroll.month.desc()).first()
@@ -753,39 +806,34 @@ def register_admin_routes(app):
         counts = {k: 0 for k in month_keys}
         done_statuses = {"done", "completed", "complete"}
 
-        personal_tasks = db.query(Task).filter(
-            Task.user_id == emp.employee_id,
-            Task.status.in_(done_statuses)
-        ).all()
-        for t in personal_tasks:
-            dt = getattr(t, "due_date", None) or getattr(t, "created_at", None)
-            if not dt:
-                continue
-            if isinstance(dt, datetime.datetime):
-                key = f"{dt.year}-{dt.month:02d}"
-            elif isinstance(dt, datetime.date):
-                key = f"{dt.year}-{dt.month:02d}"
-            else:
-                continue
-            if key in counts:
-                counts[key] += 1
-
-        project_tasks = db.query(ProjectTask).join(ProjectTaskAssignee, ProjectTaskAssignee.task_id == ProjectTask.id).filter(
-            ProjectTaskAssignee.employee_id == emp.employee_id,
-            ProjectTask.status.in_(done_statuses)
+        # Both task sources are bucketed by (year, month) in one UNION ALL
+        # round trip; only months inside the chart window are counted.
+        window_start = datetime.datetime.strptime(month_keys[0], "%Y-%m")
+        personal_at = func.coalesce(Task.due_date, Task.created_at)
+        project_at = func.coalesce(ProjectTask.deadline, ProjectTask.created_at)
+        done_tasks = union_all(
+            select(personal_at.label("at")).where(
+                Task.user_id == emp.employee_id,
+                Task.status.in_(done_statuses),
+                personal_at >= window_start,
+            ),
+            select(project_at.label("at")).join_from(
+                ProjectTask, ProjectTaskAssignee, ProjectTaskAssignee.task_id == ProjectTask.id
+            ).where(
+                ProjectTaskAssignee.employee_id == emp.employee_id,
+                ProjectTask.status.in_(done_statuses),
+                project_at >= window_start,
+            ),
+        ).subquery()
+        done_year = extract("year", done_tasks.c.at)
+        done_month = extract("month", done_tasks.c.at)
+        month_rows = db.execute(
+            select(done_year, done_month, func.count()).group_by(done_year, done_month)
         ).all()
-        for pt in project_tasks:
-            dt = getattr(pt, "deadline", None) or getattr(pt, "created_at", None)
-            if not dt:
-                continue
-            if isinstance(dt, datetime.datetime):
-                key = f"{dt.year}-{dt.month:02d}"
-            elif isinstance(dt, datetime.date):
-                key = f"{dt.year}-{dt.month:02d}"
-            else:
-                continue
+        for year, month, count in month_rows:
+            key = f"{int(year)}-{int(month):02d}"
             if key in counts:
-                counts[key] += 1
+                counts[key] += count
 
         chart_counts = [counts[k] for k in month_keys]
 
@@ -805,11 +853,9 @@ def register_admin_routes(app):
                                           })
 
     @app.get("/admin/employee_details/print", response_class=HTMLResponse)
-    async def employee_details_print(request: Request, employee_id: str,
-                                     user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
-        emp = db.query(User).filter(User.is_active == True, User.employee_id == employee_id).first()
+    def employee_details_print(request: Request, employee_id: str,
+                               user: User = Depends(require_admin), db: Session = Depends(get_db)):
+        emp = db.query(User).options(*_PHOTO_FLAG).filter(User.is_active == True, User.employee_id == employee_id).first()
         if not emp:
             return templates.TemplateResponse("admin/admin_employee_details_print.html", {
                 "request": request,
@@ -817,9 +863,7 @@ def register_admin_routes(app):
                 "error": "Employee not found",
             })
 
-        total_time = db.query(Attendance).filter(Attendance.employee_id == emp.employee_id).with_entities(
-            Attendance.duration).all()
-        total_hours = sum(d[0] for d in total_time if d[0])
+        total_hours = _total_attendance_hours(db, emp.employee_id)
 
         latest_payroll = db.query(Payroll).filter(
             Payroll.employee_id == emp.employee_id
@@ -857,8 +901,8 @@ def register_admin_routes(app):
         })
 
     @app.get("/public/employee/{employee_id}", response_class=HTMLResponse)
-    async def public_employee_profile(request: Request, employee_id: str, db: Session = Depends(get_db)):
-        emp = db.query(User).filter(User.employee_id == employee_id, User.is_active == True).first()
+    def public_employee_profile(request: Request, employee_id: str, db: Session = Depends(get_db)):
+        emp = db.query(User).options(*_PHOTO_FLAG).filter(User.employee_id == employee_id, User.is_active == True).first()
         if not emp:
             return templates.TemplateResponse("admin/admin_employee_qr.html", {
                 "request": request,
@@ -872,9 +916,7 @@ def register_admin_routes(app):
                 "error": "Employee not found",
             })
 
-        total_time = db.query(Attendance).filter(Attendance.employee_id == emp.employee_id).with_entities(
-            Attendance.duration).all()
-        total_hours = sum(d[0] for d in total_time if d[0])
+        total_hours = _total_attendance_hours(db, emp.employee_id)
 
         return templates.TemplateResponse("admin/admin_employee_qr.html", {
             "request": request,
@@ -884,12 +926,10 @@ def register_admin_routes(app):
         })
 
     @app.post("/admin/add_room")
-    async def add_room(request: Request, room_no: str = Form(...), location_name: str = Form(...),
-                       description: str = Form(...), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
+    def add_room(request: Request, room_no: str = Form(...), location_name: str = Form(...),
+                 description: str = Form(...), user: User = Depends(require_admin), db: Session = Depends(get_db)):
 
-        existing_room = db.query(Room).filter(Room.room_no == room_no, Room.location_name == location_name).first()
+        existing_room = db.query(Room.id).filter(Room.room_no == room_no, Room.location_name == location_name).first()
         if existing_room:
             raise HTTPException(status_code=400, detail="Room already exists")
 
@@ -900,12 +940,10 @@ def register_admin_routes(app):
         return {"room_id": room_id, "message": "Room added successfully"}
 
     @app.post("/admin/add_department")
-    async def add_department(request: Request, name: str = Form(...), description: str = Form(...), prefix: str = Form(None),
-                             user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
+    def add_department(request: Request, name: str = Form(...), description: str = Form(...), prefix: str = Form(None),
+                       user: User = Depends(require_admin), db: Session = Depends(get_db)):
 
-        existing_dept = db.query(Department).filter(Department.name == name).first()
+        existing_dept = db.query(Department.id).filter(Department.name == name).first()
         if existing_dept:
             raise HTTPException(status_code=400, detail="Department already exists")
 
@@ -915,9 +953,7 @@ def register_admin_routes(app):
         return {"message": "Department added successfully"}
 
     @app.post("/admin/remove_room")
-    async def remove_room(request: Request, room_id: str = Form(...), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
+    def remove_room(request: Request, room_id: str = Form(...), user: User = Depends(require_admin), db: Session = Depends(get_db)):
         room = db.query(Room).filter(Room.room_id == room_id).first()
         if not room:
             raise HTTPException(status_code=404, detail="Room not found")
@@ -929,17 +965,14 @@ def register_admin_routes(app):
         return {"message": "Room removed successfully"}
 
     @app.get("/admin/payroll", response_class=HTMLResponse)
-    async def admin_payroll(
+    def admin_payroll(
         request: Request,
         month: int = datetime.date.today().month,
         year: int = datetime.date.today().year,
-        user: User = Depends(get_current_user),
+        user: User = Depends(require_admin),
         db: Session = Depends(get_db)
     ):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Admin access required")
-
-        employees = db.query(User).filter(User.is_active == True).all()
+        employees = db.query(User).options(_WITHOUT_PHOTO).filter(User.is_active == True).all()
         payroll_data = []
 
         for emp in employees:
@@ -995,14 +1028,12 @@ def register_admin_routes(app):
 
 
     @app.get("/admin/attendance", response_class=HTMLResponse)
-    async def admin_attendance(
+    def admin_attendance(
         request: Request,
         department: Optional[str] = None,
-        user: User = Depends(get_current_user),
+        user: User = Depends(require_admin),
         db: Session = Depends(get_db)
     ):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
 
         # ------------------------------------------------------------
         # SHOW ONLY MAIN GATE ENTRIES (room_no = 77)
@@ -1057,14 +1088,12 @@ def register_admin_routes(app):
         )
 
     @app.get("/admin/unknown_rfid", response_class=HTMLResponse)
-    async def admin_unknown_rfid(
+    def admin_unknown_rfid(
         request: Request,
         search: Optional[str] = None,
-        user: User = Depends(get_current_user),
+        user: User = Depends(require_admin),
         db: Session = Depends(get_db)
     ):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
         query = db.query(UnknownRFID)
         if search:
             query = query.filter(
@@ -1084,20 +1113,18 @@ def register_admin_routes(app):
         )
 
     @app.post("/admin/resolve_rfid")
-    async def resolve_rfid(request: Request, rfid_tag: str = Form(...), db: Session = Depends(get_db)):
+    def resolve_rfid(request: Request, rfid_tag: str = Form(...), db: Session = Depends(get_db)):
         db.query(UnknownRFID).filter(UnknownRFID.rfid_tag == rfid_tag).delete()
         db.commit()
         return RedirectResponse("/admin/unknown_rfid", status_code=303)
 
     @app.get("/admin/inappropriate_entries", response_class=HTMLResponse)
-    async def admin_inappropriate_entries(
+    def admin_inappropriate_entries(
         request: Request,
         search: Optional[str] = None,
-        user: User = Depends(get_current_user),
+        user: User = Depends(require_admin),
         db: Session = Depends(get_db)
     ):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
         query = db.query(InappropriateEntry)
         if search:
             query = query.filter(
@@ -1118,28 +1145,24 @@ def register_admin_routes(app):
         )
 
     @app.post("/admin/delete_inappropriate_entry")
-    async def delete_inappropriate_entry(request: Request, entry_id: int = Form(...), db: Session = Depends(get_db)):
+    def delete_inappropriate_entry(request: Request, entry_id: int = Form(...), db: Session = Depends(get_db)):
         db.query(InappropriateEntry).filter(InappropriateEntry.id == entry_id).delete()
         db.commit()
         return RedirectResponse("/admin/inappropriate_entries", status_code=303)
 
     @app.get("/admin/leave_requests", response_class=HTMLResponse)
-    async def admin_leave_page(request: Request, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
+    def admin_leave_page(request: Request, user: User = Depends(require_admin), db: Session = Depends(get_db)):
         pending = db.query(LeaveRequest).order_by(LeaveRequest.id.desc()).all()
         return templates.TemplateResponse("admin/admin_leave_requests.html",
                                           {"request": request, "user": user, "pending": pending,
                                            "current_year": datetime.datetime.utcnow().year})
 
     @app.post("/admin/leave/update")
-    async def update_leave_status(request: Request,
-                                  leave_id: int = Form(...),
-                                  action: str = Form(...),
-                                  user: User = Depends(get_current_user),
-                                  db: Session = Depends(get_db)):
-        if user.role != "admin":
-            raise HTTPException(status_code=403, detail="Access denied")
+    def update_leave_status(request: Request,
+                            leave_id: int = Form(...),
+                            action: str = Form(...),
+                            user: User = Depends(require_admin),
+                            db: Session = Depends(get_db)):
 
         leave = db.query(LeaveRequest).filter(LeaveRequest.id == leave_id).first()
         if not leave:
@@ -1147,7 +1170,7 @@ def register_admin_routes(app):
 
         leave.status = "Approved" if action == "approve" else "Rejected"
         db.commit()
-        employee = db.query(User).filter(User.employee_id == leave.employee_id).first()
+        employee = db.query(User).options(_WITHOUT_PHOTO).filter(User.employee_id == leave.employee_id).first()
         if employee and employee.email:
             send_leave_status_email(
                 employee.email,
@@ -1171,14 +1194,11 @@ def register_admin_routes(app):
         return RedirectResponse("/admin/leave_requests", status_code=303)
     
     @app.get("/admin/attendance-intelligence", response_class=HTMLResponse)
-    async def admin_attendance_intelligence(
+    def admin_attendance_intelligence(
         request: Request,
         db: Session = Depends(get_db),
-        user: User = Depends(get_current_user)
+        user: User = Depends(require_roles("admin", "manager"))
     ):
-        if user.role not in ("admin", "manager"):
-            raise HTTPException(status_code=403)
-
         df = get_attendance_dataframe(db)
         metrics = compute_behavior_metrics(db, df)
         anomalies = detect_attendance_anomalies(df)
@@ -1,4 +1,3 @@
-import bcrypt
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
@@ -6,6 +5,9 @@ from jose import jwt, JWTError
 
 from .database import get_db
 from .models import User
+# Password hashing and login live in Security.authentication (Argon2 with
+# legacy bcrypt verification); re-exported here for existing imports.
+from Security.authentication import authenticate_user, hash_password, verify_password
 
 # ================= CONFIG =================
 SECRET_KEY = "CHANGE_THIS_SECRET"
@@ -14,34 +16,6 @@ ALGORITHM = "HS256"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
 
 
-# ================= PASSWORD UTILS =================
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(
-        password.encode("utf-8"),
-        bcrypt.gensalt()
-    ).decode("utf-8")
-
-
-def verify_password(password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(
-        password.encode("utf-8"),
-        hashed_password.encode("utf-8")
-    )
-
-
-def authenticate_user(db: Session, employee_id: str, password: str):
-
-    user = db.query(User).filter(User.employee_id == employee_id).first()
-    if not user:
-        print(f"[AUTH DEBUG] User not found for employee_id: {employee_id}")
-        return None
-    if not verify_password(password, user.password_hash):
-        print(f"[AUTH DEBUG] Password mismatch for employee_id: {employee_id}")
-        return None
-    print(f"[AUTH DEBUG] Successful login for employee_id: {employee_id}")
-    return user
-
-
 # ================= JWT AUTH (API / FUTURE WS) =================
 def get_current_user(
     token: str = Depends(oauth2_scheme),
@@ -24,7 +24,19 @@ def is_local_database(url):
 
 IS_LOCAL_DB = is_local_database(DATABASE_URL)
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# QueuePool sizing for server databases. The admin pages make many short
+# queries per request from the threadpool, so the default 5 + 10 connections
+# queue up under load. SQLite keeps its own single-file pool.
+if DATABASE_URL.startswith("sqlite"):
+    _POOL_OPTIONS = {}
+else:
+    _POOL_OPTIONS = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "25")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "25")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+
+engine = create_engine(DATABASE_URL, pool_pre_ping=True, **_POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -4,6 +4,7 @@ from email.message import EmailMessage
 from pathlib import Path
 from typing import Iterable, Optional
 import datetime
+import time
 
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 
@@ -20,6 +21,33 @@ _jinja_env = Environment(
 )
 
 
+# The settings table holds one row that only the admin page changes, so the
+# latest row is cached briefly and dropped on save.
+_SETTINGS_TTL = 60.0
+_SETTINGS_FIELDS = ("smtp_user", "smtp_pass", "smtp_from", "smtp_host", "smtp_port")
+_settings_cache: dict = {"value": None, "expires": 0.0}
+
+
+def get_email_settings() -> Optional[dict]:
+    """Return the latest EmailSettings row as a plain dict (None if unset)."""
+    now = time.monotonic()
+    if now < _settings_cache["expires"]:
+        return _settings_cache["value"]
+    db = SessionLocal()
+    try:
+        settings = db.query(EmailSettings).order_by(EmailSettings.id.desc()).first()
+        value = None if settings is None else {field: getattr(settings, field) for field in _SETTINGS_FIELDS}
+    finally:
+        db.close()
+    _settings_cache["value"] = value
+    _settings_cache["expires"] = now + _SETTINGS_TTL
+    return value
+
+
+def invalidate_email_settings() -> None:
+    _settings_cache["expires"] = 0.0
+
+
 def _get_smtp_config() -> dict:
     smtp_user = ""
     smtp_pass = ""
@@ -28,21 +56,15 @@ def _get_smtp_config() -> dict:
     smtp_port = "465"
 
     try:
-        db = SessionLocal()
-        settings = db.query(EmailSettings).order_by(EmailSettings.id.desc()).first()
-        if settings:
-            smtp_user = (settings.smtp_user or "").strip()
-            smtp_pass = (settings.smtp_pass or "").strip()
-            smtp_from = (settings.smtp_from or "").strip()
-            smtp_host = (settings.smtp_host or smtp_host).strip()
-            smtp_port = (settings.smtp_port or smtp_port).strip()
+        settings = get_email_settings()
     except Exception:
         settings = None
-    finally:
-        try:
-            db.close()
-        except Exception:
-            pass
+    if settings:
+        smtp_user = (settings["smtp_user"] or "").strip()
+        smtp_pass = (settings["smtp_pass"] or "").strip()
+        smtp_from = (settings["smtp_from"] or "").strip()
+        smtp_host = (settings["smtp_host"] or smtp_host).strip()
+        smtp_port = (settings["smtp_port"] or smtp_port).strip()
 
     if not smtp_user:
         smtp_user = os.getenv("SMTP_USER", "").strip()
@@ -1014,7 +1014,9 @@ def register_employee_routes(app):
 
     @app.get("/employee/photo/{employee_id}")
     async def employee_photo(employee_id: str, db: Session = Depends(get_db)):
-        emp = db.query(User).filter(User.employee_id == employee_id, User.is_active == True).first()
+        emp = db.query(User.photo_blob, User.photo_mime).filter(
+            User.employee_id == employee_id, User.is_active == True
+        ).first()
         if not emp or not emp.photo_blob:
             raise HTTPException(status_code=404, detail="Photo not found")
         return Response(content=emp.photo_blob, media_type=emp.photo_mime or "image/jpeg")
@@ -28,6 +28,7 @@ from .custom_error_page import router as custom_error_router
 from .routes_security import router as security_router
 from .security_bootstrap import initialize_encryption
 from Security.audit_trail import set_audit_request_context, clear_audit_request_context
+from Security.key_management import invalidate_key_cache
 
 BASE_DIR = Path(__file__).resolve().parent
 LOG_DIR = BASE_DIR.parent / "logs"
@@ -447,6 +448,8 @@ def sync_runtime_secrets_from_db() -> None:
             os.environ["DATA_ENCRYPTION_KEY"] = os.environ["ENCRYPTION_KEY"]
         if os.getenv("DATA_ENCRYPTION_KEY") and not os.getenv("ENCRYPTION_KEY"):
             os.environ["ENCRYPTION_KEY"] = os.environ["DATA_ENCRYPTION_KEY"]
+        # Keys may have just been replaced by the DB copies.
+        invalidate_key_cache()
 
         if created:
             db.commit()
@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, Date, ForeignKey, Time, Enum, UniqueConstraint, LargeBinary
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 from .database import Base
 import datetime
 
@@ -11,7 +11,7 @@ class User(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(String(60), unique=True, index=True)
-    name = Column(String(100), nullable=False)
+    name = Column(String(100), nullable=False, index=True)
     email = Column(String(100), unique=True, nullable=False)
     rfid_tag = Column(String(100), unique=True, nullable=False)
     # Reversible encrypted mirrors for secure viewing/audit workflows.
@@ -23,6 +23,9 @@ class User(Base):
     photo_path = Column(String(255), nullable=True)
     photo_blob = Column(LargeBinary, nullable=True)
     photo_mime = Column(String(50), nullable=True)
+    # Lets admin list/detail pages test for a photo while photo_blob stays
+    # deferred. Deferred itself; those queries opt in with undefer().
+    has_photo = column_property(photo_blob.isnot(None), deferred=True)
     notes = Column(Text, nullable=True)
     phone = Column(String(40), nullable=True)
     address = Column(Text, nullable=True)
@@ -14,8 +14,9 @@ from sqlalchemy.orm import Session
 
 from Security.audit_trail import audit
 from Security.hash_history import read_hash_history
-from Security.metrics import get_feature_metrics_snapshot, set_feature_enabled
-from Security.security_config import _env_path, ensure_session_secret
+from Security.key_management import invalidate_key_cache
+from Security.metrics import flush_feature_events, get_feature_metrics_snapshot, set_feature_enabled
+from Security.security_config import _env_path, ensure_session_secret, feature_enabled
 from app.app_context import get_current_user, templates
 from app.database import get_db
 from app.models import SecurityCertificate, SecurityEventRecord, SecurityManagedSetting, User
@@ -44,7 +45,10 @@ def _sanitize_required(value: str, field: str, max_len: int = 255, pattern: str
 
 def _set_env_flag(key: str, value: str) -> None:
     os.environ[key] = value
+    feature_enabled.cache_clear()
     if key in DB_ONLY_RUNTIME_KEYS:
+        # Key rotation: don't keep serving the previous decoded key.
+        invalidate_key_cache()
         # Sensitive secrets are DB-backed and should not be persisted in .env files.
         return
     env_file = _env_path()
@@ -755,6 +759,7 @@ async def prometheus_metrics(user: User = Depends(get_current_user)):
     _admin_guard(user)
     if not _env_bool("PROMETHEUS_ENABLED", True):
         raise HTTPException(status_code=404, detail="Metrics disabled")
+    flush_feature_events()
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
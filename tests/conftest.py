@@ -0,0 +1,74 @@
+import base64
+import json
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+from itsdangerous import TimestampSigner
+
+# app.database builds its engine from DATABASE_URL at import time, so point
+# it at a throwaway SQLite file before any test imports the app.
+_DB_DIR = tempfile.mkdtemp(prefix="emd-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+# Without a key, importing app.main generates one and writes it to a .env
+# file in the repo root.
+os.environ.setdefault("ENCRYPTION_KEY", base64.urlsafe_b64encode(os.urandom(32)).decode("utf-8"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_user():
+    from app.database import Base, SessionLocal, engine
+    from app.models import User
+
+    Base.metadata.create_all(bind=engine)
+
+    def _make(role="employee", **fields):
+        tag = uuid.uuid4().hex[:10]
+        values = dict(
+            employee_id=f"E-{tag}",
+            name=f"User {tag}",
+            email=f"{tag}@example.com",
+            rfid_tag=f"RF-{tag}",
+            role=role,
+            department="QA",
+            password_hash="x",
+        )
+        values.update(fields)
+        db = SessionLocal()
+        try:
+            user = User(**values)
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+            db.expunge(user)
+            return user
+        finally:
+            db.close()
+
+    return _make
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app, follow_redirects=False)
+
+
+@pytest.fixture
+def login_as(client):
+    """Sign a starlette session cookie for ``user`` the way SessionMiddleware does."""
+    signer = TimestampSigner("super-secret-key")
+
+    def _login(user):
+        data = base64.b64encode(json.dumps({"user_id": user.id}).encode("utf-8"))
+        client.cookies.clear()
+        client.cookies.set("session", signer.sign(data).decode("utf-8"))
+        return client
+
+    return _login
@@ -0,0 +1,36 @@
+import logging
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from Security import activity_logging
+
+
+@pytest.fixture
+def client(monkeypatch, caplog):
+    logger = logging.getLogger("tests.activity")
+    monkeypatch.setattr(activity_logging, "_get_logger", lambda: logger)
+    monkeypatch.setattr(activity_logging, "increment_feature_event", lambda feature_id: None)
+    caplog.set_level(logging.INFO, logger="tests.activity")
+
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/{path:path}", ok)])
+    app.add_middleware(activity_logging.ActivityLoggingMiddleware)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path, logged", [
+    ("/static/app.css", False),
+    ("/favicon.ico", False),
+    ("/metrics", True),
+    ("/metrics-export", True),
+    ("/admin", True),
+])
+def test_only_asset_paths_skip_the_log(client, caplog, path, logged):
+    client.get(path)
+    assert any(f"path={path} " in r.getMessage() for r in caplog.records) is logged
@@ -0,0 +1,39 @@
+import pytest
+
+from app.database import SessionLocal
+from app.models import User
+from Security import add_photo_columns
+
+
+@pytest.fixture
+def static_dir(tmp_path, monkeypatch):
+    (tmp_path / "uploads" / "users").mkdir(parents=True)
+    monkeypatch.setattr(add_photo_columns, "_STATIC_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _photo(user_id):
+    db = SessionLocal()
+    try:
+        row = db.get(User, user_id)
+        return row.photo_blob, row.photo_mime
+    finally:
+        db.close()
+
+
+def test_backfill_reads_static_urls_into_the_model_columns(make_user, static_dir):
+    (static_dir / "uploads" / "users" / "a.png").write_bytes(b"\x89PNG")
+    user = make_user(photo_path="/static/uploads/users/a.png")
+    missing = make_user(photo_path="/static/uploads/users/gone.png")
+
+    assert add_photo_columns.backfill_photos(batch=1) >= 1
+    assert _photo(user.id) == (b"\x89PNG", "image/png")
+    assert _photo(missing.id) == (None, None)
+
+
+def test_backfill_ignores_paths_outside_static(make_user, static_dir):
+    (static_dir.parent / "secret.png").write_bytes(b"nope")
+    user = make_user(photo_path="/static/../secret.png")
+
+    add_photo_columns.backfill_photos()
+    assert _photo(user.id) == (None, None)
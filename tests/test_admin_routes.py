@@ -0,0 +1,320 @@
+import datetime
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "method, path, data",
+    [
+        ("get", "/admin", None),
+        ("get", "/admin/payroll", None),
+        ("post", "/admin/set_base_salary", {"employee_id": "nobody", "base_salary": "1"}),
+        ("post", "/admin/add_employee", {
+            "name": "x", "email": "x@example.com", "rfid_tag": "x", "role": "employee", "department": "QA",
+        }),
+    ],
+)
+def test_admin_handlers_reject_non_admins(make_user, login_as, method, path, data):
+    client = login_as(make_user(role="employee"))
+    response = getattr(client, method)(path, data=data) if data else getattr(client, method)(path)
+    assert response.status_code == 403
+
+
+def test_set_base_salary_updates_employee_for_admin(make_user, login_as):
+    from app.database import SessionLocal
+    from app.models import User
+
+    emp = make_user(role="employee", base_salary=30000.0)
+    client = login_as(make_user(role="admin"))
+    response = client.post("/admin/set_base_salary", data={"employee_id": emp.employee_id, "base_salary": "45000"})
+
+    assert response.status_code == 303
+    db = SessionLocal()
+    try:
+        assert db.get(User, emp.id).base_salary == 45000.0
+    finally:
+        db.close()
+
+
+def test_attendance_intelligence_allows_managers_only(make_user, login_as):
+    path = "/admin/attendance-intelligence"
+    assert login_as(make_user(role="employee")).get(path).status_code == 403
+    assert login_as(make_user(role="manager")).get(path).status_code != 403
+
+
+def test_has_photo_is_only_selected_where_admin_pages_ask_for_it(make_user, login_as):
+    from sqlalchemy import select
+    from app.models import User
+
+    assert "IS NOT NULL" not in str(select(User))
+
+    with_photo = make_user(role="employee", photo_blob=b"\x89PNG", photo_mime="image/png")
+    client = login_as(make_user(role="admin"))
+    response = client.get("/admin/manage_employees", params={"search": with_photo.employee_id})
+
+    assert response.status_code == 200
+    assert f"/employee/photo/{with_photo.employee_id}" in response.text
+
+
+def test_taken_user_fields_reports_each_clash_in_one_query(make_user):
+    from app.admin_routes import _taken_user_fields
+    from app.database import SessionLocal
+
+    alice = make_user()
+    bob = make_user()
+    db = SessionLocal()
+    try:
+        taken = _taken_user_fields(db, name=alice.name, email=bob.email, rfid_tag="RF-unused")
+        assert taken == {"name", "email"}
+        assert _taken_user_fields(db, exclude_id=alice.id, email=alice.email, rfid_tag=None) == set()
+        assert _taken_user_fields(db, email=None) == set()
+    finally:
+        db.close()
+
+
+def test_add_and_update_employee_reject_duplicates(make_user, login_as):
+    alice = make_user()
+    bob = make_user()
+    client = login_as(make_user(role="admin"))
+
+    response = client.post("/admin/add_employee", data={
+        "name": "Someone New", "email": alice.email, "rfid_tag": "RF-new", "role": "employee", "department": "QA",
+    })
+    assert response.status_code == 400
+    assert "already exists" in response.text
+
+    response = client.post("/admin/update_employee", data={"employee_id": bob.employee_id, "rfid_tag": alice.rfid_tag})
+    assert response.status_code == 400
+    assert "RFID tag already in use" in response.text
+
+    response = client.post("/admin/update_employee", data={"employee_id": bob.employee_id, "email": bob.email})
+    assert response.status_code == 303
+
+
+def _add(*rows):
+    from app.database import SessionLocal
+
+    # Keep ids readable on the returned objects once the session closes.
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        db.add_all(rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_employee_pages_sum_attendance_hours(make_user, login_as):
+    from app.models import Attendance
+
+    emp = make_user()
+    idle = make_user()
+    today = datetime.date.today()
+    _add(
+        Attendance(employee_id=emp.employee_id, date=today, duration=1.5),
+        Attendance(employee_id=emp.employee_id, date=today, duration=2.0),
+        Attendance(employee_id=emp.employee_id, date=today, duration=None),
+    )
+    client = login_as(make_user(role="admin"))
+
+    for path in ("/admin/employee_details", "/admin/employee_details/print"):
+        assert client.get(path, params={"employee_id": emp.employee_id}).context["total_hours"] == 3.5
+        assert client.get(path, params={"employee_id": idle.employee_id}).context["total_hours"] == 0
+
+
+def test_task_chart_buckets_done_tasks_by_month(make_user, login_as):
+    from app.models import Project, ProjectTask, ProjectTaskAssignee, Task
+
+    emp = make_user()
+    other = make_user()
+    now = datetime.datetime.now()
+    long_ago = now - datetime.timedelta(days=800)
+    project = Project(name="P")
+    shared = ProjectTask(project=project, title="shared", status="completed", deadline=now, assignees=[
+        ProjectTaskAssignee(employee_id=emp.employee_id),
+        ProjectTaskAssignee(employee_id=other.employee_id),
+    ])
+    _add(
+        Task(user_id=emp.employee_id, title="due", status="done", due_date=now),
+        Task(user_id=emp.employee_id, title="undated", status="done", due_date=None, created_at=now),
+        Task(user_id=emp.employee_id, title="open", status="pending", due_date=now),
+        Task(user_id=emp.employee_id, title="old", status="done", due_date=long_ago),
+        shared,
+        ProjectTask(project=project, title="open", status="pending", deadline=now, assignees=[
+            ProjectTaskAssignee(employee_id=emp.employee_id),
+        ]),
+    )
+    client = login_as(make_user(role="admin"))
+
+    counts = client.get("/admin/employee_details", params={"employee_id": emp.employee_id}).context["task_chart_counts"]
+    assert len(counts) == 12
+    assert counts[-1] == 3
+    assert sum(counts) == 3
+
+
+def test_employee_forms_list_departments_and_teams_by_name(make_user, login_as):
+    from app.models import Department, Team
+
+    tag = make_user().employee_id
+    _add(
+        Department(name=f"Dept {tag}"),
+        Team(name=f"zz {tag}", department="QA"),
+        Team(name=f"aa {tag}", department="QA"),
+    )
+    emp = make_user()
+    client = login_as(make_user(role="admin"))
+
+    for path, params in (("/admin/register_employee", None), ("/admin/edit_employee", {"employee_id": emp.employee_id})):
+        context = client.get(path, params=params).context
+        assert f"Dept {tag}" in [d.name for d in context["departments"]]
+        team_names = [t.name for t in context["teams"] if t.name.endswith(tag)]
+        assert team_names == [f"aa {tag}", f"zz {tag}"]
+
+
+def test_email_settings_are_cached_and_refreshed_on_save(make_user, login_as):
+    from app import email_service
+    from app.database import SessionLocal
+    from app.models import EmailSettings
+
+    email_service.invalidate_email_settings()
+    client = login_as(make_user(role="admin"))
+    response = client.post("/admin/email_settings", data={
+        "smtp_user": "first@example.com", "smtp_pass": "pw", "smtp_host": "smtp.example.com", "smtp_port": "587",
+    })
+    assert response.status_code == 303
+    assert client.get("/admin/email_settings").context["smtp_user"] == "first@example.com"
+
+    # Writes that bypass the admin page are only picked up once the entry lapses.
+    db = SessionLocal()
+    try:
+        db.query(EmailSettings).update({"smtp_user": "direct@example.com"})
+        db.commit()
+    finally:
+        db.close()
+    assert email_service._get_smtp_config()["user"] == "first@example.com"
+    email_service.invalidate_email_settings()
+    assert email_service._get_smtp_config()["user"] == "direct@example.com"
+
+    client.post("/admin/email_settings", data={"smtp_user": "second@example.com"})
+    assert client.get("/admin/email_settings").context["smtp_user"] == "second@example.com"
+
+
+def test_existence_checks_on_rooms_departments_and_teams(make_user, login_as):
+    from app.database import SessionLocal
+    from app.models import Team, User
+
+    tag = make_user().employee_id
+    client = login_as(make_user(role="admin"))
+
+    room = {"room_no": tag, "location_name": "HQ", "description": "-"}
+    assert client.post("/admin/add_room", data=room).status_code == 200
+    assert client.post("/admin/add_room", data=room).status_code == 400
+    dept = {"name": f"Dept {tag}", "description": "-"}
+    assert client.post("/admin/add_department", data=dept).status_code == 200
+    assert client.post("/admin/add_department", data=dept).status_code == 400
+
+    team = Team(name=f"Team {tag}", department="QA")
+    _add(team)
+    emp = make_user()
+
+    def team_after(team_id):
+        client.post("/admin/update_employee", data={"employee_id": emp.employee_id, "team_id": str(team_id)})
+        db = SessionLocal()
+        try:
+            return db.get(User, emp.id).current_team_id
+        finally:
+            db.close()
+
+    assert team_after(team.id) == team.id
+    assert team_after(999999) is None
+
+
+def test_photo_uploads_are_capped(make_user, login_as, monkeypatch):
+    from app import admin_routes
+    from app.database import SessionLocal
+    from app.models import User
+
+    monkeypatch.setattr(admin_routes, "_MAX_PHOTO_BYTES", 8)
+    emp = make_user()
+    client = login_as(make_user(role="admin"))
+
+    def upload(data):
+        return client.post(
+            "/admin/update_employee",
+            data={"employee_id": emp.employee_id},
+            files={"photo": ("me.png", data, "image/png")},
+        )
+
+    assert upload(b"123456789").status_code == 413
+    assert upload(b"12345678").status_code == 303
+    db = SessionLocal()
+    try:
+        stored = db.get(User, emp.id)
+        assert (stored.photo_blob, stored.photo_mime) == (b"12345678", "image/png")
+    finally:
+        db.close()
+
+
+def test_add_employee_retries_a_stale_employee_id(make_user, login_as, monkeypatch):
+    from app import admin_routes
+    from app.models import Department
+
+    prefix = "X" + make_user().employee_id[-6:]
+    _add(Department(name=f"Dept {prefix}", prefix=prefix))
+    make_user(employee_id=f"{prefix}999")
+    make_user(employee_id=f"{prefix}1000")
+
+    # The first lookup returns an id another hire already took, as a
+    # concurrent request would see it.
+    real_next = admin_routes._next_employee_id
+    stale = iter([f"{prefix}999"])
+    monkeypatch.setattr(admin_routes, "_next_employee_id", lambda db, p: next(stale, None) or real_next(db, p))
+    monkeypatch.setattr(admin_routes, "send_welcome_email", lambda *args: False)
+    client = login_as(make_user(role="admin"))
+
+    response = client.post("/admin/add_employee", data={
+        "name": f"Hire {prefix}", "email": f"{prefix}@example.com", "rfid_tag": f"RF-{prefix}",
+        "role": "employee", "department": f"Dept {prefix}",
+    })
+    assert response.status_code == 200
+    assert response.json()["employee_id"] == f"{prefix}1001"
+
+
+def test_remove_employee_clears_only_their_leader_columns(make_user, login_as):
+    from app.database import SessionLocal
+    from app.models import RemovedEmployee, Team, User
+
+    leaving = make_user()
+    staying = make_user()
+    acting = Team(name="acting", department="QA", leader_id=leaving.id, permanent_leader_id=staying.id)
+    permanent = Team(name="permanent", department="QA", leader_id=staying.id, permanent_leader_id=leaving.id)
+    both = Team(name="both", department="QA", leader_id=leaving.id, permanent_leader_id=leaving.id)
+    _add(acting, permanent, both)
+    client = login_as(make_user(role="admin"))
+
+    assert client.post("/admin/remove_employee", data={"employee_id": leaving.employee_id}).status_code == 303
+    db = SessionLocal()
+    try:
+        leaders = {t.name: (t.leader_id, t.permanent_leader_id) for t in db.query(Team).filter(
+            Team.id.in_([acting.id, permanent.id, both.id]))}
+        assert leaders == {
+            "acting": (None, staying.id),
+            "permanent": (staying.id, None),
+            "both": (None, None),
+        }
+        assert db.get(User, leaving.id) is None
+        assert db.query(RemovedEmployee).filter(RemovedEmployee.employee_id == leaving.employee_id).count() == 1
+    finally:
+        db.close()
+
+
+def test_admin_handlers_run_in_the_threadpool():
+    import inspect
+
+    from fastapi.routing import APIRoute
+    from app.main import app
+
+    admin_routes = [
+        r for r in app.routes if isinstance(r, APIRoute) and r.endpoint.__module__ == "app.admin_routes"
+    ]
+    assert admin_routes
+    assert [r.path for r in admin_routes if inspect.iscoroutinefunction(r.endpoint)] == []
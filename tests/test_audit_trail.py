@@ -0,0 +1,52 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from app import routes_security
+from Security import audit_trail
+
+
+@pytest.fixture
+def audit_log(tmp_path, monkeypatch, caplog):
+    logger = logging.getLogger("tests.audit")
+    monkeypatch.setattr(audit_trail, "_logger", lambda: logger)
+    monkeypatch.setattr(audit_trail, "increment_feature_event", lambda feature_id: None)
+    monkeypatch.setattr(routes_security, "_env_path", lambda: str(tmp_path / ".env"))
+    monkeypatch.setenv("FEATURE_AUDIT_TRAIL_ENABLED", "true")
+    audit_trail.feature_enabled.cache_clear()
+    caplog.set_level(logging.INFO, logger="tests.audit")
+    yield caplog
+    audit_trail.feature_enabled.cache_clear()
+
+
+def test_console_toggle_applies_immediately(audit_log):
+    audit_trail.audit("first")
+    routes_security._set_env_flag("FEATURE_AUDIT_TRAIL_ENABLED", "false")
+    audit_trail.audit("dropped")
+    routes_security._set_env_flag("FEATURE_AUDIT_TRAIL_ENABLED", "true")
+    audit_trail.audit("second")
+
+    events = [r.args[0] for r in audit_log.records]
+    assert events == ["first", "second"]
+
+
+def _request(headers, host=None):
+    return SimpleNamespace(
+        state=SimpleNamespace(),
+        headers=SimpleNamespace(raw=headers),
+        client=SimpleNamespace(host=host) if host else None,
+    )
+
+
+@pytest.mark.parametrize(
+    "headers, host, expected",
+    [
+        ([(b"x-forwarded-for", b" 1.1.1.1 , 2.2.2.2"), (b"x-real-ip", b"9.9.9.9")], "5.5.5.5", "1.1.1.1"),
+        ([(b"x-forwarded-for", b"  "), (b"x-real-ip", b" 9.9.9.9 ")], "5.5.5.5", "9.9.9.9"),
+        ([(b"x-forwarded-for", b", 1.1.1.1")], "5.5.5.5", "5.5.5.5"),
+        ([(b"x-forwarded-for", b"")], None, "-"),
+    ],
+)
+def test_client_ip_falls_back_past_empty_forwarded_for(headers, host, expected):
+    assert audit_trail._client_ip(_request(headers, host)) == expected
@@ -0,0 +1,53 @@
+import bcrypt
+import pytest
+from argon2 import PasswordHasher
+
+from app.database import SessionLocal
+from app.models import User
+from Security import authentication
+
+
+def _stored_hash(user_id):
+    db = SessionLocal()
+    try:
+        return db.get(User, user_id).password_hash
+    finally:
+        db.close()
+
+
+def _login(user, password):
+    db = SessionLocal()
+    try:
+        return authentication.authenticate_user(db, user.employee_id, password)
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("legacy_hash", [
+    bcrypt.hashpw(b"s3cret", bcrypt.gensalt(rounds=4)).decode("utf-8"),
+    PasswordHasher(time_cost=1, memory_cost=8192, parallelism=1).hash("s3cret"),
+])
+def test_login_rehashes_outdated_hashes(make_user, legacy_hash):
+    user = make_user(password_hash=legacy_hash)
+
+    assert _login(user, "s3cret") is not None
+    upgraded = _stored_hash(user.id)
+    assert upgraded.startswith("$argon2")
+    assert not authentication.needs_rehash(upgraded)
+    assert _login(user, "s3cret") is not None
+
+
+def test_current_hash_is_left_alone(make_user):
+    current = authentication.hash_password("s3cret")
+    user = make_user(password_hash=current)
+
+    assert _login(user, "s3cret") is not None
+    assert _stored_hash(user.id) == current
+
+
+def test_failed_login_does_not_rehash(make_user):
+    legacy = bcrypt.hashpw(b"s3cret", bcrypt.gensalt(rounds=4)).decode("utf-8")
+    user = make_user(password_hash=legacy)
+
+    assert _login(user, "wrong") is None
+    assert _stored_hash(user.id) == legacy
@@ -0,0 +1,77 @@
+import hashlib
+
+import pytest
+from sqlalchemy import text
+
+from app.database import Base, SessionLocal, engine
+from app.models import Department, User
+from Security import add_hash_columns, backfill_hashes, hash_history
+
+
+def _sha(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def fresh_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(hash_history, "_LOG_PATH", str(tmp_path / "hash_history.log"))
+    monkeypatch.setattr(hash_history, "_WRITER", None)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        db.add(User(employee_id="2260001", name="Asha", email="asha@example.com",
+                    rfid_tag="RF1", role="employee", department="IT", password_hash="x"))
+        db.add(Department(name="IT"))
+        db.flush()
+        db.execute(text(
+            "INSERT INTO attendance (employee_id, date, status) VALUES ('2260001', '2026-01-05', 'PRESENT')"
+        ))
+        db.commit()
+    yield
+    with hash_history._FILE_LOCK:
+        if hash_history._WRITER is not None:
+            hash_history._WRITER.close()
+            hash_history._WRITER = None
+
+
+def test_backfill_skips_tables_without_hash_columns():
+    updated = backfill_hashes.backfill_hashes()
+
+    assert updated["users"] == 1
+    assert updated["attendance"] == 0
+    assert updated["departments"] == 0
+    with SessionLocal() as db:
+        user = db.query(User).one()
+        assert user.email_hash == _sha("asha@example.com")
+
+
+def test_backfill_fills_every_table_with_hash_columns():
+    add_hash_columns.main()
+
+    updated = backfill_hashes.backfill_hashes()
+
+    assert updated["users"] == 1
+    assert updated["attendance"] == 1
+    assert updated["departments"] == 1
+    with SessionLocal() as db:
+        row = db.execute(text("SELECT employee_id_hash, status_hash FROM attendance")).one()
+        assert row == (_sha("2260001"), _sha("PRESENT"))
+        assert db.execute(text("SELECT name_hash FROM departments")).scalar() == _sha("IT")
+
+    # Nothing is stale any more, and nothing is missing.
+    assert set(backfill_hashes.backfill_hashes().values()) == {0}
+    assert set(backfill_hashes.backfill_hashes(only_missing=True).values()) == {0}
+
+
+def test_default_run_fixes_stale_hashes_and_only_missing_skips_them():
+    add_hash_columns.main()
+    backfill_hashes.backfill_hashes()
+    with SessionLocal() as db:
+        # Renamed without a hash sync: the stored hash is now stale.
+        db.execute(text("UPDATE departments SET name = 'Finance'"))
+        db.commit()
+
+    assert backfill_hashes.backfill_hashes(only_missing=True)["departments"] == 0
+    assert backfill_hashes.backfill_hashes()["departments"] == 1
+    with SessionLocal() as db:
+        assert db.execute(text("SELECT name_hash FROM departments")).scalar() == _sha("Finance")
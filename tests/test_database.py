@@ -0,0 +1,34 @@
+import importlib.util
+
+import pytest
+
+from app import database
+
+
+def _load_database(monkeypatch, url, **env):
+    monkeypatch.setenv("DATABASE_URL", url)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    # A private copy of app.database, so the shared engine and Base are untouched.
+    spec = importlib.util.spec_from_file_location("_database_under_test", database.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize("env, expected", [
+    ({}, (25, 25, 1800)),
+    ({"DB_POOL_SIZE": "7", "DB_MAX_OVERFLOW": "3", "DB_POOL_RECYCLE": "60"}, (7, 3, 60)),
+])
+def test_server_databases_get_a_sized_pool(monkeypatch, env, expected):
+    for name in ("DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DB_POOL_RECYCLE"):
+        monkeypatch.delenv(name, raising=False)
+    pool = _load_database(monkeypatch, "mysql+pymysql://user:pw@db.example.com/app", **env).engine.pool
+
+    assert (pool.size(), pool._max_overflow, pool._recycle) == expected
+    assert pool._pre_ping
+
+
+def test_sqlite_keeps_its_default_pool(monkeypatch, tmp_path):
+    module = _load_database(monkeypatch, f"sqlite:///{tmp_path / 'x.db'}", DB_POOL_SIZE="7")
+    assert module._POOL_OPTIONS == {}
@@ -0,0 +1,83 @@
+import logging
+import threading
+
+import pytest
+
+from app.database import Base, engine
+from Security import hash_history
+
+
+def _payload(entity_id: str) -> dict:
+    return hash_history.hash_history_payload(
+        entity_type="users",
+        entity_id=entity_id,
+        field_name="email_hash",
+        old_hash=None,
+        new_hash="h" + entity_id,
+        actor_id="system",
+        actor_name="test",
+    )
+
+
+def _log(entity_id: str) -> None:
+    payload = _payload(entity_id)
+    del payload["timestamp"]
+    hash_history.log_hash_history(**payload)
+
+
+def _table_ids() -> list[str]:
+    return sorted(e["entity_id"] for e in hash_history._read_payloads_from_db(limit=None))
+
+
+@pytest.fixture(autouse=True)
+def fresh_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(hash_history, "_LOG_PATH", str(tmp_path / "hash_history.log"))
+    # Route tests may have started the real writer; it would race these tests
+    # for the shared queue.
+    hash_history._stop_worker()
+    monkeypatch.setattr(hash_history, "_WRITER", None)
+    monkeypatch.setattr(hash_history, "_WORKER", None)
+    monkeypatch.setattr(hash_history, "_STOP", threading.Event())
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield
+    hash_history._stop_worker()
+
+
+def test_read_merges_file_only_lines_without_duplicates(monkeypatch):
+    hash_history.log_hash_history_batch([_payload("1")])
+    # A batch whose insert never reached the table lives only in the file.
+    with monkeypatch.context() as m:
+        m.setattr(hash_history, "_insert_rows", lambda payloads, db=None: None)
+        hash_history.log_hash_history_batch([_payload("2")])
+    hash_history.log_hash_history_batch([_payload("3")])
+
+    for limit in (None, 10):
+        ids = sorted(e["entity_id"] for e in hash_history.read_hash_history(limit=limit))
+        assert ids == ["1", "2", "3"]
+
+
+def test_stop_flushes_queued_entries(monkeypatch):
+    # No worker running: entries only leave the queue through the shutdown flush.
+    monkeypatch.setattr(hash_history, "_start_worker", lambda: None)
+    for i in range(3):
+        _log(str(i))
+    assert _table_ids() == []
+
+    hash_history._stop_worker()
+
+    assert hash_history._QUEUE.empty()
+    assert _table_ids() == ["0", "1", "2"]
+
+
+def test_worker_keeps_table_write_when_file_append_fails(monkeypatch, caplog):
+    def broken_append(payloads):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(hash_history, "_append_to_file", broken_append)
+    _log("7")
+    with caplog.at_level(logging.ERROR, logger="security.hash_history"):
+        hash_history._stop_worker()
+
+    assert _table_ids() == ["7"]
+    assert "file append failed" in caplog.text
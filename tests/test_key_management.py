@@ -0,0 +1,52 @@
+import base64
+import os
+
+import pytest
+
+from app import routes_security
+from Security import key_management
+
+
+def _b64key(fill: int) -> str:
+    return base64.urlsafe_b64encode(bytes([fill]) * 32).decode("ascii")
+
+
+@pytest.fixture(autouse=True)
+def isolated_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(key_management, "_env_path", lambda: str(tmp_path / ".env"))
+    monkeypatch.delenv("ENCRYPTION_KEY", raising=False)
+    monkeypatch.delenv("DATA_ENCRYPTION_KEY", raising=False)
+    key_management.invalidate_key_cache()
+    yield
+    key_management.invalidate_key_cache()
+    for name in ("ENCRYPTION_KEY", "DATA_ENCRYPTION_KEY"):
+        os.environ.pop(name, None)
+
+
+def test_console_rotation_serves_new_key(monkeypatch):
+    monkeypatch.setenv("ENCRYPTION_KEY", _b64key(1))
+    assert key_management.get_aes256_key() == bytes([1]) * 32
+
+    routes_security._set_env_flag("ENCRYPTION_KEY", _b64key(2))
+
+    assert key_management.get_aes256_key() == bytes([2]) * 32
+    assert os.environ["DATA_ENCRYPTION_KEY"] == _b64key(2)
+
+
+def test_unchanged_key_is_served_from_cache(monkeypatch):
+    monkeypatch.setenv("ENCRYPTION_KEY", _b64key(3))
+    first = key_management.get_aes256_key()
+    monkeypatch.setattr(key_management, "ensure_data_encryption_key", lambda env_name: pytest.fail("reloaded"))
+    assert key_management.get_aes256_key() is first
+
+
+def test_key_with_surrounding_whitespace_is_accepted(monkeypatch):
+    monkeypatch.setenv("ENCRYPTION_KEY", " " + _b64key(4) + "\r\n")
+    assert key_management.get_aes256_key() == bytes([4]) * 32
+
+
+@pytest.mark.parametrize("raw", [_b64key(5)[:-2], _b64key(5) + "AAAA", base64.urlsafe_b64encode(b"x" * 16).decode()])
+def test_wrong_length_key_is_rejected(monkeypatch, raw):
+    monkeypatch.setenv("ENCRYPTION_KEY", raw)
+    with pytest.raises(ValueError):
+        key_management.get_aes256_key()
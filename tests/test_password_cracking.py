@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pytest
+
+from Security import password_cracking
+from Security.login_attempt_limiting import create_login_limiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(password_cracking, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def _fail(limiter, key, times):
+    for _ in range(times):
+        limiter.record_failure(key)
+
+
+def test_locks_after_max_attempts_and_unlocks_after_lock_window(clock):
+    limiter = create_login_limiter(max_attempts=3, window_seconds=60, lock_seconds=120)
+    _fail(limiter, "alice", 2)
+    assert not limiter.is_locked("alice")
+    limiter.record_failure("alice")
+    assert limiter.is_locked("alice")
+
+    clock.value += 119
+    assert limiter.is_locked("alice")
+    clock.value += 2
+    assert not limiter.is_locked("alice")
+
+
+def test_slow_failures_refill_the_bucket(clock):
+    limiter = create_login_limiter(max_attempts=3, window_seconds=60, lock_seconds=120)
+    for _ in range(10):
+        limiter.record_failure("bob")
+        clock.value += 30
+    assert not limiter.is_locked("bob")
+
+
+def test_reset_clears_failures_and_lock(clock):
+    limiter = create_login_limiter(max_attempts=2, window_seconds=60, lock_seconds=120)
+    _fail(limiter, "carol", 2)
+    assert limiter.is_locked("carol")
+    limiter.reset("carol")
+    assert not limiter.is_locked("carol")
+    limiter.record_failure("carol")
+    assert not limiter.is_locked("carol")
+
+
+def test_key_spray_does_not_evict_a_live_lock(clock):
+    limiter = create_login_limiter(max_attempts=2, window_seconds=60, lock_seconds=600, max_keys=10)
+    _fail(limiter, "victim", 2)
+    for i in range(100):
+        _fail(limiter, f"spray-{i}", 2)
+
+    assert limiter.is_locked("victim")
+    assert len(limiter._buckets) <= 10
+
+
+def test_expired_locks_are_pruned(clock):
+    limiter = create_login_limiter(max_attempts=1, window_seconds=60, lock_seconds=10)
+    for i in range(50):
+        _fail(limiter, f"old-{i}", 1)
+    clock.value += 11
+    limiter.record_failure("new")
+
+    assert list(limiter._locked_until) == ["new"]
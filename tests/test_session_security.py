@@ -0,0 +1,108 @@
+import base64
+import json
+import time
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from Security import session_security
+from Security.session_security import EncryptedSessionMiddleware
+
+# TestClient sends both of these, so they are what the middleware fingerprints.
+_UA = "testclient"
+_HOST = "testclient"
+
+
+async def _login(request):
+    request.session["user_id"] = 1
+    return JSONResponse({})
+
+
+async def _whoami(request):
+    return JSONResponse({"user_id": request.session.get("user_id")})
+
+
+@pytest.fixture
+def middleware():
+    app = Starlette(routes=[Route("/login", _login), Route("/whoami", _whoami)])
+    return EncryptedSessionMiddleware(app, secret_key="test-secret", https_only=False)
+
+
+@pytest.fixture
+def client(middleware):
+    return TestClient(middleware)
+
+
+def _seal(middleware, session, **claims):
+    now = int(time.time())
+    data = {"data": session, "iat": now, "last": now, "exp": now + 3600, **claims}
+    nonce = b"\x01" * session_security._NONCE_SIZE
+    sealed = middleware.aead.encrypt(nonce, json.dumps(data).encode("utf-8"), None)
+    return base64.urlsafe_b64encode(nonce + sealed).rstrip(b"=").decode("ascii")
+
+
+def _open(middleware, cookie):
+    raw = base64.urlsafe_b64decode(cookie + "=" * (-len(cookie) % 4))
+    size = session_security._NONCE_SIZE
+    return json.loads(middleware.aead.decrypt(raw[:size], raw[size:], None))
+
+
+def _whoami_with(client, cookie):
+    response = client.get("/whoami", headers={"cookie": f"session={cookie}"})
+    return response.json()["user_id"], response.cookies.get("session")
+
+
+def test_aes_gcm_round_trip(client, middleware):
+    client.get("/login")
+    cookie = client.cookies["session"]
+
+    assert _open(middleware, cookie)["data"]["user_id"] == 1
+    assert client.get("/whoami").json()["user_id"] == 1
+
+
+def test_legacy_fernet_cookie_is_accepted_and_reissued_as_aes_gcm(client, middleware):
+    now = int(time.time())
+    payload = {
+        "data": {"user_id": 7, "_fp": session_security._fingerprint(_UA, _HOST)},
+        "iat": now, "last": now, "exp": now + 3600,
+    }
+    legacy = middleware.legacy_fernet.encrypt(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+    user_id, reissued = _whoami_with(client, legacy)
+    assert user_id == 7
+    assert _open(middleware, reissued)["data"]["user_id"] == 7
+
+
+def test_tampered_cookie_is_rejected(client, middleware):
+    cookie = _seal(middleware, {"user_id": 1})
+    flipped = cookie[:-2] + ("A" if cookie[-2] != "A" else "B") + cookie[-1]
+
+    assert _whoami_with(client, flipped)[0] is None
+    assert _whoami_with(client, "not-a-session")[0] is None
+
+
+@pytest.mark.parametrize("claims", [
+    {"exp": 1},
+    {"last": 1},
+])
+def test_expired_cookie_is_rejected(client, middleware, claims):
+    assert _whoami_with(client, _seal(middleware, {"user_id": 1}, **claims))[0] is None
+
+
+def test_wrong_fingerprint_is_rejected(client, middleware):
+    other = session_security._fingerprint("some other browser", "10.0.0.9")
+    assert _whoami_with(client, _seal(middleware, {"user_id": 1, "_fp": other}))[0] is None
+
+    legacy_other = session_security._legacy_fingerprint("some other browser", "10.0.0.9")
+    assert _whoami_with(client, _seal(middleware, {"user_id": 1, "_fp": legacy_other}))[0] is None
+
+
+def test_legacy_sha256_fingerprint_is_upgraded_to_blake2b(client, middleware):
+    legacy_fp = session_security._legacy_fingerprint(_UA, _HOST)
+
+    user_id, reissued = _whoami_with(client, _seal(middleware, {"user_id": 1, "_fp": legacy_fp}))
+    assert user_id == 1
+    assert _open(middleware, reissued)["data"]["_fp"] == session_security._fingerprint(_UA, _HOST)